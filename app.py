@@ -1,32 +1,77 @@
-import os, random, time
-from math import sqrt, atan2, cos, sin
+import os, sys, random, time, json, atexit, subprocess, traceback
+import urllib.request
+from urllib.parse import urlencode
+from collections import deque
+from math import isfinite
 
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, Response, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, request, redirect, jsonify, abort
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
+
+from assets import Asset, IMMUTABLE
+from spatial import SpatialGrid
+import protocol
+from protocol import ClientView, encode_binary
+from scheduler import FixedTimestep
+from inputs import InputBuffer
+from metrics import PhaseTimer, SamplingProfiler, summary
+from sim import (World, WORLD_W, WORLD_H, WORLD_RADIUS, PELLET_RADIUS, PLAYER_RADIUS,
+                 PLAYER_SPEED, BOOST_MULT, ROT_SPEED, SHARP_LEN, PHYSICS_RATE, VIEW_CELL,
+                 PELLET_COLORS, STEP_PHASES)
 
 
 # ---------- ПАРАМЕТРЫ ----------
-WORLD_W, WORLD_H = 20000, 12000
-WORLD_RADIUS = min(WORLD_W, WORLD_H) // 2
-WORLD_CENTER = (WORLD_W / 2, WORLD_H / 2)
-PELLET_COUNT = 1000
-PELLET_RADIUS = 6
-PLAYER_RADIUS = 22
-PLAYER_SPEED = 220
-BOOST_MULT = 2.0
-ROT_SPEED = 4.0
-TICK_RATE = 30
-BASE_DAMAGE = 50
-MAX_HP = 100
-SHARP_LEN = 12
-DAMAGE_COOLDOWN = 0.6
-PUSH_STRENGTH = 10.0
+# параметры мира и физики — в sim.py
+MAX_CATCHUP = 5  # сколько шагов симуляции можно догнать за одну итерацию цикла
+# Частоты, Гц. Шаг симуляции (PHYSICS_RATE) — в sim.py. Кадры state идут реже:
+# клиент интерполирует между ними. Частота state округляется до делителя
+# PHYSICS_RATE; свёрнутые вкладки и клиенты без ввода получают IDLE_SNAPSHOT_RATE.
+SNAPSHOT_RATE = min(PHYSICS_RATE, max(1, int(os.environ.get("SNAPSHOT_RATE", 15))))
+SNAPSHOT_EVERY = max(1, round(PHYSICS_RATE / SNAPSHOT_RATE))  # тиков между кадрами state
+IDLE_SNAPSHOT_RATE = max(1, int(os.environ.get("IDLE_SNAPSHOT_RATE", 3)))
+IDLE_EVERY = max(1, round(PHYSICS_RATE / SNAPSHOT_EVERY / IDLE_SNAPSHOT_RATE))  # рассылок на кадр
+IDLE_AFTER = 2.0  # с без input — клиент считается простаивающим
+INPUT_RATE = max(1, int(os.environ.get("INPUT_RATE", 30)))  # как часто клиент шлёт input
+# обратное давление: в очереди Engine.IO клиента больше SEND_BACKLOG пакетов —
+# кадр state ему не ставим, а долю получаемых кадров делим пополам (не ниже
+# MIN_SEND_SHARE); каждый кадр, ушедший в пустую очередь, прибавляет SEND_SHARE_STEP
+SEND_BACKLOG = 3
+MIN_SEND_SHARE = 1 / 8
+SEND_SHARE_STEP = 0.05
+# фазы тика для /metrics: шаги симуляции + рассылка событий, state и overview
+PHASES = STEP_PHASES + ("events", "state", "overview")
+PAYLOAD_SAMPLE = 10  # размер JSON-кадров state меряем в каждой 10-й рассылке
+PROFILER = os.environ.get("PROFILER") == "1"  # включает /profile (семплирующий профайлер)
+# область видимости клиента (AOI): размер окна, присланный клиентом, + запас
+VIEW_W, VIEW_H = 1920, 1080          # если клиент не прислал размер окна
+MAX_VIEW_W, MAX_VIEW_H = 3840, 2160
+VIEW_MARGIN = 150
+# лимит событий input/boost от одного клиента (сверх него события только считаются)
+INPUT_LIMIT = 2 * INPUT_RATE         # событий в секунду
+INPUT_BURST = INPUT_RATE             # запас ведра токенов
+OVERVIEW_RATE = 2                    # Гц: миникарта и таблица лидеров
+# миникарта — сетка плотности игроков: MINIMAP_COLS × MINIMAP_ROWS ячеек на мир,
+# в ячейке уровень 1..MINIMAP_LEVELS = bit_length(число игроков): 1, 2–3, 4–7, 8+
+MINIMAP_COLS, MINIMAP_ROWS = 40, 24
+MINIMAP_LEVELS = 4
+# формат кадров state по умолчанию: "json" или "bin" (клиент может выбрать сам через ?proto=)
+STATE_FORMAT = os.environ.get("STATE_FORMAT", "json")
+# транспорты Engine.IO в порядке попыток клиента: по умолчанию long-polling
+# с апгрейдом до WebSocket; TRANSPORTS=polling — для сетей, где WebSocket режут прокси
+TRANSPORTS = [t.strip() for t in os.environ.get("TRANSPORTS", "polling,websocket").split(",") if t.strip()]
+# арены: несколько независимых комнат в процессе, у каждой свой цикл
+ARENAS = int(os.environ.get("ARENAS", 1))
+ARENA_CAPACITY = int(os.environ.get("ARENA_CAPACITY", 50))
+# шарды — отдельные процессы со своими аренами (по одному на ядро).
+# SHARDS — публичные адреса всех шардов через запятую, SHARD_ID — номер этого.
+# WORKERS=N при запуске `python app.py` поднимает N шардов на портах PORT..PORT+N-1.
+SHARDS = [u.strip().rstrip("/") for u in os.environ.get("SHARDS", "").split(",") if u.strip()]
+SHARD_ID = int(os.environ.get("SHARD_ID", 0))
 
 # ---------- СЕРВЕР ----------
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # static/ отдаёт static_asset(): с хешем в URL и сжатием
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
@@ -34,190 +79,50 @@ socketio = SocketIO(
     ping_timeout=20,
     ping_interval=10,
     logger=True,
-    engineio_logger=True
+    engineio_logger=True,
+    transports=TRANSPORTS,
+    allow_upgrades="websocket" in TRANSPORTS,
 )
-
-# ✅ правильный способ запретить WebSocket-апгрейд:
-if hasattr(socketio, "server") and hasattr(socketio.server, "eio"):
-    socketio.server.eio.allow_upgrades = False
-else:
-    print("⚠️ Engine.IO backend not yet initialized; skipping upgrade restriction.")
-
-
-players = {}
-pellets = []
-last_hits = {}
-
 # ---------- УТИЛИТЫ ----------
-def rand_color_type():
-    color = random.choice(["#ff4b4b", "#3adb40", "#3da9ff"])  # приятные голубые оттенки
-    return "score", color
-
-def respawn_pellet():
-    """Создаёт пеллет внутри круга арены"""
-    t, c = rand_color_type()
-    while True:
-        x = random.uniform(PELLET_RADIUS, WORLD_W - PELLET_RADIUS)
-        y = random.uniform(PELLET_RADIUS, WORLD_H - PELLET_RADIUS)
-        cx, cy = WORLD_CENTER
-        if sqrt((x - cx) ** 2 + (y - cy) ** 2) <= WORLD_RADIUS - PELLET_RADIUS:
-            return {"x": x, "y": y, "type": t, "color": c}
-
-def ensure_pellets():
-    while len(pellets) < PELLET_COUNT:
-        pellets.append(respawn_pellet())
-
-def distance(ax, ay, bx, by):
-    return sqrt((ax-bx)**2 + (ay-by)**2)
-
-# ---------- HTML ----------
-@app.route("/")
-def index():
+def parse_view(view):
+    """Полуразмеры области видимости по размеру окна клиента (с ограничением сверху)"""
+    try:
+        w = min(MAX_VIEW_W, max(1, float(view.get("w", VIEW_W))))
+        h = min(MAX_VIEW_H, max(1, float(view.get("h", VIEW_H))))
+    except (TypeError, ValueError, AttributeError):
+        w, h = VIEW_W, VIEW_H
+    return w / 2 + VIEW_MARGIN, h / 2 + VIEW_MARGIN
+
+# ---------- СТРАНИЦА ----------
+# страница и статика собираются один раз при старте: CSS и JS лежат в static/
+# и отдаются по URL с хешем содержимого, поэтому кешируются навсегда, а сама
+# страница — с ETag, так что повторный заход стоит серверу ответа 304
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+assets = {}  # имя с хешем -> Asset
+
+def static_url(name, mimetype):
+    """Регистрирует файл из static/ и возвращает его URL с хешем содержимого"""
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        asset = Asset(f.read(), mimetype, cache=IMMUTABLE)
+    base, ext = os.path.splitext(name)
+    hashed = f"{base}.{asset.digest[:12]}{ext}"
+    assets[hashed] = asset
+    return f"/static/{hashed}"
+
+def render_page():
+    css = static_url("game.css", "text/css")
+    js = static_url("game.js", "text/javascript")
+    # клиент Socket.IO 4.8.1 — своя копия вместо CDN: без стороннего запроса
+    # перед подключением и без зависимости от внешней сети
+    sio = static_url("socket.io.min.js", "text/javascript")
     html = f"""<!doctype html>
 <html lang="ru"><head><meta charset="utf-8"/>
 <meta name="viewport" content="width=device-width, initial-scale=1"/>
 <title>Spike.io</title>
-<style>
-html,body{{margin:0;padding:0;height:100%;overflow:hidden;background:#0f1220;color:#fff;font-family:'Inter',system-ui;}}
-canvas{{width:100vw;height:100vh;display:block;cursor:crosshair;}}
-#hud{{position:fixed;top:10px;left:10px;background:rgba(0,0,0,.3);padding:12px 16px;border-radius:12px;backdrop-filter:blur(8px);border:1px solid rgba(255,255,255,0.15);box-shadow:0 0 10px rgba(255,255,255,0.1);}}
-#minimap {{
-  position: fixed;
-  right: 20px;
-  bottom: 20px;
-  width: 220px;
-  height: 220px;
-  aspect-ratio: 1 / 1;
-  object-fit: contain;
-  background: rgba(15, 18, 32, 0.6);
-  border: 2px solid rgba(255, 255, 255, 0.2);
-  border-radius: 12px;
-  box-shadow: 0 0 20px rgba(64, 201, 255, 0.15);
-  backdrop-filter: blur(6px);
-  z-index: 50;
-  display: none;
-}}
-
-#leaderboard {{
-  position: fixed;
-  right: 20px;
-  top: 20px;
-  width: 220px;
-  background: rgba(15, 18, 32, 0.7);
-  border: 1px solid rgba(255, 255, 255, 0.2);
-  border-radius: 12px;
-  padding: 10px 14px;
-  font-size: 15px;
-  color: #fff;
-  backdrop-filter: blur(6px);
-  box-shadow: 0 0 15px rgba(64, 201, 255, 0.1);
-  z-index: 50;
-  display: none;
-}}
-#leaderboard h3 {{
-  font-size: 16px;
-  text-align: center;
-  margin: 4px 0 8px;
-  color: #40c9ff;
-  text-shadow: 0 0 8px rgba(64, 201, 255, 0.6);
-}}
-#leaderList {{
-  margin: 0;
-  padding-left: 20px;
-  list-style: none;
-}}
-#leaderList li {{
-  margin: 3px 0;
-  font-size: 14px;
-  color: rgba(255, 255, 255, 0.85);
-}}
-#leaderList li.me {{
-  color: #40c9ff;
-  font-weight: bold;
-}}
-
-#buffContainer {{
-  position: fixed;
-  bottom: 30px;
-  left: 50%;
-  transform: translateX(-50%);
-  display: none;
-  gap: 20px;
-  z-index: 20;
-}}
-
-.buffCard {{
-  background: rgba(30,34,60,0.9);
-  border: 1px solid rgba(255,255,255,0.15);
-  border-radius: 12px;
-  padding: 14px 20px;
-  font-size: 18px;
-  color: white;
-  box-shadow: 0 0 20px rgba(64,201,255,0.2);
-  backdrop-filter: blur(8px);
-  transition: 0.25s;
-  min-width: 200px;
-  text-align: center;
-}}
-.buffCard:hover {{
-  background: rgba(50,55,90,0.95);
-  box-shadow: 0 0 25px rgba(64,201,255,0.4);
-  transform: translateY(-4px);
-}}
-#healthbar{{width:220px;height:18px;background:#222;border-radius:6px;overflow:hidden;margin-bottom:8px;position:relative;box-shadow:inset 0 0 4px #000;}}
-#healthfill{{position:absolute;left:0;top:0;height:100%;background:linear-gradient(90deg,#00ff88,#ff4455);transition:width 0.15s;}}
-#stats{{font-size:15px;line-height:1.4em;}}
-#menu,#death{{position:fixed;inset:0;display:flex;flex-direction:column;align-items:center;justify-content:center;
-background:radial-gradient(circle at center,#141628,#0f1220);gap:20px;font-size:18px;color:white;text-align:center;}}
-#menu input,#menu button,#menu select,#death button{{padding:10px 18px;font-size:18px;border:none;border-radius:8px;outline:none;}}
-#menu select{{background:#1b1e34;color:white;cursor:pointer;transition:0.25s;border:1px solid rgba(255,255,255,0.2);box-shadow:inset 0 0 8px rgba(255,255,255,0.1);}}
-#menu select:hover{{background:#262a45;box-shadow:0 0 10px rgba(64,201,255,0.4);}}
-#menu label{{font-size:16px;margin-top:6px;opacity:0.9;}}
-#menu button,#death button{{background:#40c9ff;color:white;cursor:pointer;transition:0.25s all;box-shadow:0 0 20px #40c9ff55;}}
-#menu button:hover,#death button:hover{{transform:scale(1.05);background:#5ed3ff;box-shadow:0 0 25px #5ed3ffaa;}}
-#menu{{animation:fadeIn 0.6s ease-out;}}
-@keyframes fadeIn{{from{{opacity:0;transform:translateY(20px);}}to{{opacity:1;transform:translateY(0);}}}}
-#menu{{animation:fadeIn 0.8s ease-out;}}
-@keyframes fadeIn{{from{{opacity:0;transform:translateY(20px);}}to{{opacity:1;transform:translateY(0);}}}}
-#death {{
-  display:none;
-  flex-direction:column;
-  align-items:center;
-  justify-content:center;
-  background:rgba(0,0,0,0.85);
-  font-size:24px;
-  text-align:center;
-  color:white;
-  text-shadow:0 0 10px #ff3030;
-  z-index: 9999;
-}}
-/* --- карточка персонажа на главном экране --- */
-#characterCard{{ 
-  display:flex;
-  flex-direction:column;
-  align-items:center;
-  justify-content:center;
-  gap:12px;
-  padding:20px 28px;
-  background:rgba(20,24,40,0.8);
-  border:1px solid rgba(255,255,255,0.1);
-  border-radius:16px;
-  box-shadow:0 0 25px rgba(64,201,255,0.08);
-  backdrop-filter:blur(10px);
-  margin-top:10px;
-}}
-
-#characterCard label{{font-size:16px;opacity:0.85;margin-top:4px;}}
-#characterCard select,#characterCard input{{width:200px;text-align:center;}}
-#characterCard select{{background:#1b1e34;color:white;border:none;border-radius:8px;padding:8px;cursor:pointer;
-box-shadow:inset 0 0 8px rgba(255,255,255,0.1);transition:0.25s;}}
-#characterCard select:hover{{background:#262a45;box-shadow:0 0 10px rgba(64,201,255,0.4);}}
-#previewContainer{{margin-top:6px;display:flex;flex-direction:column;align-items:center;}}
-#menu h1{{margin-bottom:0;}}
-.rules{{max-width:460px;line-height:1.6;font-size:16px;opacity:0.9;}}
-.rules span{{display:inline-block;margin:4px 0;}}
-.color-circle{{display:inline-block;width:14px;height:14px;border-radius:50%;margin-right:6px;vertical-align:middle;box-shadow:0 0 6px currentColor;}}
-</style></head>
+<link rel="preload" href="{sio}" as="script"/>
+<link rel="preload" href="{js}" as="script"/>
+<link rel="stylesheet" href="{css}"/>
+</head>
 <body>
 <canvas id="game"></canvas>
 
@@ -289,715 +194,536 @@ box-shadow:inset 0 0 8px rgba(255,255,255,0.1);transition:0.25s;}}
   <button id="restartBtn" style="margin-top:16px;">Играть снова</button>
 </div>
 
-<script src="https://cdn.socket.io/4.7.5/socket.io.min.js"></script>
+<script src="{sio}"></script>
 <script>
 const WORLD_W={WORLD_W},WORLD_H={WORLD_H},WORLD_RADIUS={WORLD_RADIUS},
       PLAYER_RADIUS={PLAYER_RADIUS},PELLET_RADIUS={PELLET_RADIUS},
-      TICK_RATE={TICK_RATE},SHARP_LEN={SHARP_LEN};
-const canvas=document.getElementById('game'),ctx=canvas.getContext('2d');
-const hud=document.getElementById('hud'),menu=document.getElementById('menu'),death=document.getElementById('death');
-const hpText=document.getElementById('hpText'),damageText=document.getElementById('damageText'),hpFill=document.getElementById('healthfill');
-const nameInput=document.getElementById('nameInput'),playBtn=document.getElementById('playBtn'),restartBtn=document.getElementById('restartBtn');
-const colorSelect=document.getElementById('colorSelect'),
-      spikeSelect=document.getElementById('spikeSelect');
-const previewCanvas=document.getElementById('previewCanvas'),
-      pctx=previewCanvas.getContext('2d');
-let previewColor=colorSelect.value, previewSpike=spikeSelect.value, previewAngle=0;
-
-
-
-function resize(){{canvas.width=window.innerWidth;canvas.height=window.innerHeight;}}window.addEventListener('resize',resize);resize();
-
-const socket=io();
-let me=null,players={{}},pellets=[],mouse={{x:0,y:0}},boosting=false;
-let sparks=[],trail=[];
-
-canvas.addEventListener('mousemove',e=>{{mouse.x=e.clientX;mouse.y=e.clientY;}});
-canvas.addEventListener('mousedown',()=>{{boosting=true;socket.emit('boost',{{state:true}});}});
-canvas.addEventListener('mouseup',()=>{{boosting=false;socket.emit('boost',{{state:false}});}});
-
-// обновление превью при выборе цвета или шипа
-function updatePreview(){{
-  previewColor=colorSelect.value;
-  previewSpike=spikeSelect.value;
-}}
-colorSelect.addEventListener('change', updatePreview);
-spikeSelect.addEventListener('change', updatePreview);
-
-// цикл отрисовки превью
-function drawPreview() {{
-  const dpr = window.devicePixelRatio || 1;
-  const w = 160, h = 160;
-  previewCanvas.width = w * dpr;
-  previewCanvas.height = h * dpr;
-  previewCanvas.style.width = w + 'px';
-  previewCanvas.style.height = h + 'px';
-  pctx.setTransform(dpr, 0, 0, dpr, 0, 0);
-
-  const cx = w / 2, cy = h / 2;
-  pctx.clearRect(0, 0, w, h);
-
-  // фон
-  const g = pctx.createRadialGradient(cx, cy, 20, cx, cy, 80);
-  g.addColorStop(0, '#181a2f');
-  g.addColorStop(1, '#0f1220');
-  pctx.fillStyle = g;
-  pctx.fillRect(0, 0, w, h);
-
-  // тело персонажа
-  pctx.beginPath();
-  pctx.fillStyle = previewColor;
-  pctx.shadowBlur = 12;
-  pctx.shadowColor = previewColor;
-  pctx.arc(cx, cy, PLAYER_RADIUS, 0, Math.PI * 2);
-  pctx.fill();
-  pctx.shadowBlur = 0;
-
-  // отрисовка шипа
-  try {{
-    drawSpikeCtx(pctx, {{ spike: previewSpike, angle: previewAngle }}, cx, cy);
-  }} catch(e) {{
-    console.error("Ошибка в drawSpike preview:", e);
-  }}
-
-
-  previewAngle += 0.02;
-  requestAnimationFrame(drawPreview);
-}}
-drawPreview();
-
-
-
-playBtn.onclick=()=>{{
-  const n=(nameInput.value||"Player").slice(0,16);
-  const color=colorSelect.value;
-  const spike=spikeSelect.value;
-  socket.emit('spawn',{{name:n,color:color,spike:spike}}); // передаем выбранные параметры
-  menu.style.display='none';
-  hud.style.display='block';
-  minimap.style.display = 'block';
-  leaderboard.style.display = 'block';
-}};
-restartBtn.onclick = () => {{
-  death.style.display = 'none';
-  menu.style.display = 'flex';
-  minimap.style.display = 'none';
-  leaderboard.style.display = 'none';
-}};
-
-socket.on('welcome',d=>{{me=d.me;players=d.players;pellets=d.pellets;updateStats();}});
-socket.on('state',d=>{{players=d.players;pellets=d.pellets;if(players[socket.id]){{me=players[socket.id];updateStats();}}}});
-socket.on('dead', data => {{
-  const score = data && typeof data.score !== 'undefined' ? data.score : (me ? me.score : 0);
-  me = null;
-  players = {{}};
-  pellets = [];
-  hud.style.display = 'none';
-  death.style.display = 'flex';
-  menu.style.display = 'none';
-  minimap.style.display = 'none';
-  leaderboard.style.display = 'none';
-  ctx.clearRect(0, 0, canvas.width, canvas.height);
-
-  const scoreEl = document.getElementById('finalScore');
-  if (scoreEl) {{
-    scoreEl.textContent = `⭐ Ваш счёт: ${{score}}`;
-  }}
-}});
-
-socket.on('spark', s => {{
-  sparks.push({{x:s.x,y:s.y,life:0.4,particles:Array.from({{length:12}},()=>({{
-    vx:(Math.random()-0.5)*320, vy:(Math.random()-0.5)*320, r:Math.random()*2+1
-  }}))}});
-}});
-
-let floatTexts = [];
-
-socket.on('kill_bonus', data => {{
-  floatTexts.push({{
-    x: data.x,
-    y: data.y,
-    value: data.value,
-    life: 1.0 // секунда жизни
-  }});
-}});
-
-function updateStats() {{
-  if (!me) return;
-  hpText.textContent = Math.round(me.hp) + " / " + Math.round(me.max_hp);
-  damageText.textContent = me.damage;
-  const scoreEl = document.getElementById('scoreText');
-  if (scoreEl) scoreEl.textContent = me.score || 0;
-  hpFill.style.width = (Math.max(0, me.hp / me.max_hp) * 100) + '%';
-}}
-
-setInterval(()=>{{if(!me)return;const wx=me.x+(mouse.x-canvas.width/2),wy=me.y+(mouse.y-canvas.height/2);socket.emit('input',{{targetX:wx,targetY:wy}});}},1000/TICK_RATE);
-
-// --- отрисовка шипов в любой контекст ---
-function drawSpikeCtx(gctx, pl, sx, sy) {{
-  const sizeMul = pl.spike_size || 1.0;
-  const lenMul = pl.spike_length || 1.0;
-  const spike = pl.spike || "classic";
-  const angle = pl.angle;
-  gctx.save();
-
-  if (spike === 'classic') {{
-      gctx.beginPath();
-      const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + SHARP_LEN*lenMul);
-      const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + SHARP_LEN*lenMul);
-      gctx.moveTo(tipX, tipY);
-      gctx.lineTo(sx + Math.cos(angle+2.5)*(PLAYER_RADIUS*sizeMul-4), sy + Math.sin(angle+2.5)*(PLAYER_RADIUS*sizeMul-4));
-      gctx.lineTo(sx + Math.cos(angle-2.5)*(PLAYER_RADIUS*sizeMul-4), sy + Math.sin(angle-2.5)*(PLAYER_RADIUS*sizeMul-4));
-      gctx.closePath();
-      gctx.fillStyle = '#fff';
-      gctx.fill();
-  }} 
-  else if (spike === 'unicorn') {{
-    const len = SHARP_LEN *lenMul * 2.5;
-    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
-    grad.addColorStop(0, '#ff00ff');
-    grad.addColorStop(0.25, '#00ffff');
-    grad.addColorStop(0.5, '#00ff88');
-    grad.addColorStop(0.75, '#ffff00');
-    grad.addColorStop(1, '#ff00ff');
-    gctx.beginPath();
-    gctx.moveTo(tipX, tipY);
-    gctx.lineTo(sx + Math.cos(angle+2.2)*(PLAYER_RADIUS*sizeMul-5), sy + Math.sin(angle+2.2)*(PLAYER_RADIUS*sizeMul-5));
-    gctx.lineTo(sx + Math.cos(angle-2.2)*(PLAYER_RADIUS*sizeMul-5), sy + Math.sin(angle-2.2)*(PLAYER_RADIUS*sizeMul-5));
-    gctx.closePath();
-    gctx.fillStyle = grad;
-    gctx.shadowBlur = 25;
-    gctx.shadowColor = '#ffffff';
-    gctx.fill();
-    gctx.beginPath();
-    gctx.arc(tipX, tipY, 3, 0, Math.PI*2);
-    gctx.fillStyle = 'rgba(255,255,255,0.9)';
-    gctx.fill();
-  }} 
-  else if (spike === 'blade') {{
-    const len = SHARP_LEN *lenMul * 1.8;
-    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const side1X = sx + Math.cos(angle+0.5)*(PLAYER_RADIUS*sizeMul-6);
-    const side1Y = sy + Math.sin(angle+0.5)*(PLAYER_RADIUS*sizeMul-6);
-    const side2X = sx + Math.cos(angle-0.5)*(PLAYER_RADIUS*sizeMul-6);
-    const side2Y = sy + Math.sin(angle-0.5)*(PLAYER_RADIUS*sizeMul-6);
-    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
-    grad.addColorStop(0, '#888');
-    grad.addColorStop(0.2, '#cfd8e0');
-    grad.addColorStop(0.5, '#ffffff');
-    grad.addColorStop(0.8, '#9bb2c3');
-    grad.addColorStop(1, '#5a6d7f');
-    gctx.beginPath();
-    gctx.moveTo(tipX, tipY);
-    gctx.lineTo(side1X, side1Y);
-    gctx.lineTo(side2X, side2Y);
-    gctx.closePath();
-    gctx.fillStyle = grad;
-    gctx.shadowBlur = 10;
-    gctx.shadowColor = '#aee6ff';
-    gctx.fill();
-    gctx.beginPath();
-    const midX = (sx + tipX) / 2;
-    const midY = (sy + tipY) / 2;
-    gctx.moveTo(midX, midY);
-    gctx.lineTo(tipX, tipY);
-    gctx.strokeStyle = 'rgba(255,255,255,0.5)';
-    gctx.lineWidth = 1.2;
-    gctx.stroke();
-  }} 
-  else if (spike === 'lazer') {{
-    const len = SHARP_LEN *lenMul * 2.4;
-    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
-    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
-    grad.addColorStop(0, 'rgba(255,50,50,0.1)');
-    grad.addColorStop(0.5, 'rgba(255,80,80,0.8)');
-    grad.addColorStop(1, 'rgba(255,200,200,1)');
-    gctx.beginPath();
-    gctx.moveTo(sx, sy);
-    gctx.lineTo(tipX, tipY);
-    gctx.strokeStyle = grad;
-    gctx.lineWidth = 3;
-    gctx.shadowBlur = 15;
-    gctx.shadowColor = '#ff3030';
-    gctx.stroke();
-    gctx.beginPath();
-    gctx.arc(tipX, tipY, 3, 0, Math.PI*2);
-    gctx.fillStyle = 'rgba(255,255,255,0.9)';
-    gctx.shadowBlur = 20;
-    gctx.shadowColor = '#ff4040';
-    gctx.fill();
-  }}
-
-  gctx.restore();
-}}
-
-
-// --- отрисовка шипов (blade = металл, lazer = лазер) ---
-function drawSpike(pl, sx, sy) {{
-  // рисуем тем же кодом, но в контекст игрового canvas
-  drawSpikeCtx(ctx, pl, sx, sy);
-}}
-
-
-// --- баффы ---
-const buffContainer = document.getElementById('buffContainer');
-let activeBuffs = [];
-
-socket.on('buff_choices', buffs => {{
-  buffContainer.innerHTML = '';
-  buffs.forEach((b, i) => {{
-    const div = document.createElement('div');
-    div.className = 'buffCard';
-    div.textContent = `${{i+1}}️⃣ ${{b.name}}`;
-    buffContainer.appendChild(div);
-  }});
-  buffContainer.style.display = 'flex';
-  activeBuffs = buffs;
-}});
-
-window.addEventListener('keydown', e => {{
-  if (!activeBuffs.length) return;
-  const n = parseInt(e.key);
-  if (n >= 1 && n <= 3) {{
-    socket.emit('choose_buff', {{ index: n - 1 }});
-    buffContainer.style.display = 'none';
-    activeBuffs = [];
-  }}
-}});
-
-function drawBackground(time) {{
-  const gradient = ctx.createRadialGradient(canvas.width/2, canvas.height/2, 200, canvas.width/2, canvas.height/2, canvas.width * 1.2);
-  gradient.addColorStop(0, '#15182c');
-  gradient.addColorStop(1, '#0c0f1d');
-  ctx.fillStyle = gradient;
-  ctx.fillRect(0, 0, canvas.width, canvas.height);
-
-  if (!me) return;
-
-  // --- рисуем красную границу карты ---
-  const camX = me.x - canvas.width/2;
-  const camY = me.y - canvas.height/2;
-  const worldCenterX = WORLD_W / 2 - camX;
-  const worldCenterY = WORLD_H / 2 - camY;
-
-  ctx.beginPath();
-  ctx.arc(worldCenterX, worldCenterY, WORLD_RADIUS, 0, Math.PI * 2);
-  ctx.strokeStyle = 'rgba(255,60,60,0.6)';
-  ctx.lineWidth = 6;
-  ctx.shadowBlur = 15;
-  ctx.shadowColor = '#ff3030';
-  ctx.stroke();
-  ctx.shadowBlur = 0;
-}}
-
-function drawSparks(dt, camX, camY){{ 
-  for(const s of sparks) {{
-    s.life-=dt;
-    const t=0.4-s.life;
-    for(const p of s.particles) {{
-      const sx=s.x-camX+p.vx*t,sy=s.y-camY+p.vy*t;
-      ctx.beginPath();
-      ctx.fillStyle='rgba(255,220,100,'+Math.max(0,s.life*2).toFixed(3)+')';
-      ctx.shadowBlur=12;ctx.shadowColor='#ffb400';
-      ctx.arc(sx,sy,p.r,0,Math.PI*2);
-      ctx.fill();
-    }}
-  }}
-  ctx.shadowBlur=0;
-  sparks=sparks.filter(s=>s.life>0);
-}}
-
-let lastTS=performance.now();
-function draw(){{ 
-  const nowTS=performance.now();
-  const dt=Math.min(0.05,(nowTS-lastTS)/1000.0);
-  lastTS=nowTS;
-
-  if(!me){{requestAnimationFrame(draw);return;}}
-  const camX=me.x-canvas.width/2,camY=me.y-canvas.height/2;
-
-  drawBackground(nowTS*0.0002);
-
-  for(const p of pellets){{const sx=p.x-camX,sy=p.y-camY;
-    ctx.beginPath();ctx.fillStyle=p.color;ctx.shadowBlur=12;ctx.shadowColor=p.color;
-    ctx.arc(sx,sy,PELLET_RADIUS,0,Math.PI*2);ctx.fill();ctx.shadowBlur=0;}}
-
-  const myTrail={{x:me.x,y:me.y,time:nowTS}};
-  trail.push(myTrail);
-  trail=trail.filter(t=>nowTS-t.time<400);
-  for(const t of trail) {{
-    const age=(nowTS-t.time)/400;
-    ctx.beginPath();
-    ctx.fillStyle='rgba(255,255,255,'+(1-age)*0.2+')';
-    ctx.arc(t.x-camX,t.y-camY,PLAYER_RADIUS*(1-age*0.7),0,Math.PI*2);
-    ctx.fill();
-  }}
-
-  for(const sid in players){{ 
-      const pl=players[sid]; 
-      const sx=pl.x-camX, sy=pl.y-camY;
-      ctx.beginPath();
-      ctx.fillStyle=pl.color;
-      ctx.shadowBlur=20;
-      ctx.shadowColor=pl.color;
-      ctx.arc(sx,sy,PLAYER_RADIUS,0,Math.PI*2);
-      ctx.fill();
-      ctx.shadowBlur=0;
-    
-      drawSpike(pl, sx, sy);
-    
-      ctx.fillStyle='rgba(255,255,255,0.9)';
-      ctx.font='15px Inter';
-      ctx.textAlign='center';
-      ctx.fillText(pl.name,sx,sy-PLAYER_RADIUS-12);
-    }}
-
-  // --- отрисовка границы карты ---
-  const worldCenterX = WORLD_W/2 - camX;
-  const worldCenterY = WORLD_H/2 - camY;
-  const pulse = Math.sin(performance.now() * 0.003) * 0.15 + 0.85;
-
-  ctx.beginPath();
-  ctx.arc(worldCenterX, worldCenterY, WORLD_RADIUS, 0, Math.PI * 2);
-  ctx.strokeStyle = `rgba(255,80,80,${{pulse}})`;
-  ctx.lineWidth = 20;
-  ctx.shadowBlur = 40;
-  ctx.shadowColor = '#ff4040';
-  ctx.stroke();
-  ctx.shadowBlur = 0;
-  drawSparks(dt,camX,camY);
-  for (const t of floatTexts) {{
-  t.life -= dt;
-  const camX = me.x - canvas.width/2;
-  const camY = me.y - canvas.height/2;
-  const alpha = Math.max(0, t.life);
-  const sy = t.y - camY - (1.0 - t.life) * 40; // всплывает вверх
-  const sx = t.x - camX;
-  ctx.save();
-  ctx.font = 'bold 26px Inter';
-  ctx.fillStyle = `rgba(255,200,80,${{alpha}})`;
-  ctx.shadowBlur = 20;
-  ctx.shadowColor = '#ffcc66';
-  ctx.textAlign = 'center';
-  ctx.fillText('+' + t.value, sx, sy);
-  ctx.restore();
-  }}
-  floatTexts = floatTexts.filter(t => t.life > 0);
-  if(boosting){{ctx.beginPath();ctx.arc(canvas.width/2,canvas.height/2,PLAYER_RADIUS+14,0,Math.PI*2);ctx.strokeStyle='rgba(255,255,255,0.3)';ctx.lineWidth=2;ctx.stroke();}}
-  
-  // --- Миникарта и лидерборд ---
- const minimap = document.getElementById('minimap');
- const mctx = minimap.getContext('2d');
- const leaderList = document.getElementById('leaderList');
-
- function drawMinimap() {{
-   minimap.width = minimap.clientWidth;
-   minimap.height = minimap.clientHeight;
-   const w = minimap.width, h = minimap.height;
-   mctx.clearRect(0, 0, w, h);  
-
-   const scale = (w / 2) / WORLD_RADIUS;
-   const cx = w / 2, cy = h / 2;
-
-   // фон карты
-   mctx.beginPath();
-   mctx.arc(cx, cy, WORLD_RADIUS * scale, 0, Math.PI * 2);
-   mctx.fillStyle = 'rgba(30, 34, 60, 0.8)';
-   mctx.fill();
-   mctx.strokeStyle = 'rgba(255, 60, 60, 0.4)';
-   mctx.lineWidth = 2;
-   mctx.stroke();
-
-   // точки игроков
-   for (const sid in players) {{
-     const p = players[sid];
-     const px = cx + (p.x - WORLD_W / 2) * scale;
-     const py = cy + (p.y - WORLD_H / 2) * scale;
-     mctx.beginPath();
-     mctx.arc(px, py, 3, 0, Math.PI * 2);
-     if (sid === socket.id) {{
-       mctx.fillStyle = '#40c9ff';
-       mctx.shadowBlur = 6;
-       mctx.shadowColor = '#40c9ff';
-     }} else {{
-       mctx.fillStyle = 'rgba(255,255,255,0.7)';
-       mctx.shadowBlur = 0;
-     }}
-     mctx.fill();
-   }}
- }}
-
- function updateLeaderboard() {{
-   const sorted = Object.values(players)
-     .sort((a, b) => b.score - a.score)
-     .slice(0, 10);
-
-   leaderList.innerHTML = '';
-   sorted.forEach((p, i) => {{
-     const li = document.createElement('li');
-     li.textContent = `${{i + 1}}. ${{p.name}} — ${{p.score}}`;
-     if (p.sid === socket.id) li.classList.add('me');
-     leaderList.appendChild(li);
-   }});
- }}
-  drawMinimap();
-  updateLeaderboard();
-  requestAnimationFrame(draw);
-  
-}}draw();
-</script></body></html>"""
-    return Response(html, mimetype="text/html")
+      INPUT_RATE={INPUT_RATE},SNAPSHOT_RATE={PHYSICS_RATE / SNAPSHOT_EVERY!r},SHARP_LEN={SHARP_LEN},MINIMAP_COLS={MINIMAP_COLS},MINIMAP_ROWS={MINIMAP_ROWS},MINIMAP_LEVELS={MINIMAP_LEVELS},
+      PLAYER_SPEED={PLAYER_SPEED},BOOST_MULT={BOOST_MULT},ROT_SPEED={ROT_SPEED};
+const PELLET_COLORS={json.dumps(PELLET_COLORS)},POS_SCALE={protocol.POS_SCALE},
+      HP_SCALE={protocol.HP_SCALE},ANGLE_SCALE={protocol.ANGLE_SCALE!r},
+      FX_SPARK={protocol.FX_SPARK},FX_KILL_BONUS={protocol.FX_KILL_BONUS};
+const TRANSPORTS={json.dumps(TRANSPORTS)};
+</script>
+<script src="{js}"></script>
+</body></html>
+"""
+    return Asset(html, "text/html", cache="no-cache")
+
+PAGE = render_page()
+
+@app.route("/static/<name>")
+def static_asset(name):
+    asset = assets.get(name)
+    if asset is None:
+        abort(404)
+    return asset.response(request)
+
+# ---------- HTML ----------
+@app.route("/")
+def index():
+    # сокет подключается к тому же origin, поэтому шард выбирается здесь:
+    # при нескольких шардах отправляем на наименее загруженный
+    if len(SHARDS) > 1 and "shard" not in request.args:
+        best = best_shard()
+        if best != SHARD_ID:
+            args = dict(request.args, shard=best)
+            return redirect(f"{SHARDS[best]}/?{urlencode(args)}")
+    return PAGE.response(request)
+
+
+# ---------- МЕТРИКИ ----------
+profiler = SamplingProfiler()
+
+def emit_queues():
+    """Очереди исходящих пакетов Engine.IO: (всего пакетов, самая длинная очередь)"""
+    total = worst = 0
+    for s in list(socketio.server.eio.sockets.values()):
+        n = s.queue.qsize()
+        total += n
+        worst = max(worst, n)
+    return total, worst
+
+def send_backlog(sid):
+    """Пакетов в очереди Engine.IO клиента sid (0 — сокета уже нет)"""
+    server = socketio.server
+    s = server.eio.sockets.get(server.manager.eio_sid_from_sid(sid, "/"))
+    return s.queue.qsize() if s is not None else 0
+
+def transport_counts():
+    """Сколько клиентов сидит на каждом транспорте Engine.IO"""
+    eio = socketio.server.eio
+    counts = {t: 0 for t in ("polling", "websocket")}
+    for eio_sid in list(eio.sockets):
+        try:
+            t = eio.transport(eio_sid)
+        except KeyError:  # сокет закрылся, пока считали
+            continue
+        counts[t] = counts.get(t, 0) + 1
+    return counts
+
+@app.route("/metrics")
+def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    lines = [
+        "# HELP spikeio_clients Connected clients by Engine.IO transport.",
+        "# TYPE spikeio_clients gauge",
+    ]
+    for t, n in transport_counts().items():
+        lines.append(f'spikeio_clients{{transport="{t}"}} {n}')
+    gauges = [
+        ("players", "gauge", "Players currently in the arena.", lambda a: len(a.players)),
+        ("pellets", "gauge", "Pellets currently in the arena.", lambda a: len(a.world.pellets)),
+        ("state_payload_bytes", "gauge", "State bytes sent in one broadcast (sampled).", lambda a: a.payload_bytes),
+        ("ticks_total", "counter", "Simulation steps executed.", lambda a: a.ticker.ticks),
+        ("ticks_skipped_total", "counter", "Simulation steps dropped by the catch-up cap.", lambda a: a.ticker.skipped),
+        ("tick_overruns_total", "counter", "Loop iterations that took longer than one step.", lambda a: a.ticker.overruns),
+        ("clients_throttled", "gauge", "Clients getting fewer state frames because of send backlog.", lambda a: len(a.send_share)),
+        ("state_dropped_total", "counter", "State frames not sent because the client's queue was backed up.", lambda a: a.state_dropped),
+        ("inputs_limited_total", "counter", "Input/boost events over the per-client rate limit (still applied).", lambda a: a.inputs.limited),
+        ("inputs_coalesced_total", "counter", "Input/boost events overwritten by a newer one before the step.", lambda a: a.inputs.coalesced),
+    ]
+    for name, kind, text, value in gauges:
+        lines += [f"# HELP spikeio_{name} {text}", f"# TYPE spikeio_{name} {kind}"]
+        for a in matchmaker.arenas:
+            lines.append(f'spikeio_{name}{{arena="{a.id}"}} {value(a)}')
+    lines += [
+        "# HELP spikeio_tick_work_seconds Work time of the loop iteration (last and moving average).",
+        "# TYPE spikeio_tick_work_seconds gauge",
+    ]
+    for a in matchmaker.arenas:
+        lines.append(f'spikeio_tick_work_seconds{{arena="{a.id}",stat="last"}} {a.ticker.work:.6f}')
+        lines.append(f'spikeio_tick_work_seconds{{arena="{a.id}",stat="avg"}} {a.ticker.work_avg:.6f}')
+    lines += summary("spikeio_tick_phase_seconds", "Time per tick phase over the last 10 s.",
+                     {a.id: a.timer for a in matchmaker.arenas})
+    total, worst = emit_queues()
+    lines += [
+        "# HELP spikeio_emit_queue Packets waiting in Engine.IO send queues.",
+        "# TYPE spikeio_emit_queue gauge",
+        f'spikeio_emit_queue{{stat="total"}} {total}',
+        f'spikeio_emit_queue{{stat="max"}} {worst}',
+    ]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+@app.route("/profile")
+def profile():
+    """Профиль ближайших ?ticks=N итераций циклов арен в формате folded (для flamegraph)"""
+    if not PROFILER:
+        return Response("profiler is disabled, start the server with PROFILER=1\n", status=404, mimetype="text/plain")
+    ticks = max(1, min(request.args.get("ticks", PHYSICS_RATE * 5, type=int), PHYSICS_RATE * 600))
+    if not profiler.start(ticks):
+        return Response("profiler is already running\n", status=409, mimetype="text/plain")
+    deadline = time.monotonic() + ticks / PHYSICS_RATE * 3 + 5
+    while profiler.active and time.monotonic() < deadline:
+        socketio.sleep(0.1)
+    profiler.stop()
+    return Response(profiler.folded(), mimetype="text/plain")
+
+# ---------- ШАРДЫ ----------
+shard_loads = {}  # адрес шарда -> (когда спрашивали, свободных мест)
+
+@app.route("/load")
+def load():
+    """Загрузка этого шарда — её опрашивают соседи при выборе шарда для игрока"""
+    return jsonify(shard=SHARD_ID, players=matchmaker.players(), free=matchmaker.free())
+
+def shard_free(i):
+    """Свободные места на шарде i; ответы соседей кешируются на секунду"""
+    if i == SHARD_ID:
+        return matchmaker.free()
+    url = SHARDS[i]
+    cached = shard_loads.get(url)
+    if cached and time.time() - cached[0] < 1.0:
+        return cached[1]
+    try:
+        with urllib.request.urlopen(url + "/load", timeout=0.3) as r:
+            free = int(json.load(r)["free"])
+    except (OSError, ValueError, KeyError):
+        free = -1  # шард недоступен — туда не отправляем
+    shard_loads[url] = (time.time(), free)
+    return free
+
+def best_shard():
+    """Шард с наибольшим числом свободных мест (при равенстве — этот же)"""
+    return max(range(len(SHARDS)), key=lambda i: (shard_free(i), i == SHARD_ID))
 
 
 # ---------- СЕРВЕРНЫЕ СОБЫТИЯ (без изменений логики) ----------
 @socketio.on("spawn")
 def spawn(data):
     sid=request.sid
+    old = arena_of(sid)
+    if old: old.leave(sid)
+    arena = matchmaker.place()
+    # повторный спавн мог попасть в другую арену — уходим из старой комнаты
+    for room in rooms():
+        if room.startswith("arena-") and room != arena.room:
+            leave_room(room)
+    join_room(arena.room)
     name=str(data.get("name","Player"))[:16]
     color = data.get("color", random.choice(["#ffca3a", "#8ac926", "#1982c4", "#6a4c93", "#ff9f1c"]))
     spike = data.get("spike", "classic")
-    x=random.randint(PLAYER_RADIUS,WORLD_W-PLAYER_RADIUS)
-    y=random.randint(PLAYER_RADIUS,WORLD_H-PLAYER_RADIUS)
-    players[sid] = {
-        "x": x,
-        "y": y,
-        "tx": x,
-        "ty": y,
-        "angle": 0.0,
-        "hp": MAX_HP,
-        "max_hp": MAX_HP,
-        "damage": BASE_DAMAGE,
-        "regen": 5.0,
-        "speed_mult": 1.0,
-        "boost_mult": 1.0,
-        "spike_size": 1.0,
-        "spike_length": 1.0,
-        "score": 0,
-        "boost": False,
-        "name": name,
-        "color": color,
-        "spike": spike
-
-    }
-
-    ensure_pellets()
-    emit("welcome", {"me": {**players[sid], "sid": sid}, "players": players, "pellets": pellets})
+    fmt = data.get("fmt") or STATE_FORMAT
+    me = arena.join(sid, name, color, spike, data.get("view") or {}, binary=(fmt == "bin"))
+    # остальной мир придёт со следующим state — только в пределах видимости
+    emit("welcome", {"me": me.to_dict()})
 
 @socketio.on("disconnect")
-def disconnect(): players.pop(request.sid,None)
+def disconnect():
+    for arena in matchmaker.arenas:
+        arena.leave(request.sid)
 
+@socketio.on("view")
+def on_view(data):
+    sid = request.sid
+    arena = arena_of(sid)
+    if arena:
+        data = data if isinstance(data, dict) else {}
+        arena.views[sid] = parse_view(data)
+        # свёрнутая вкладка: кадры state реже (IDLE_SNAPSHOT_RATE)
+        if data.get("hidden"):
+            arena.hidden.add(sid)
+        else:
+            arena.hidden.discard(sid)
+
+# input и boost только буферизуются: разбор и применение — в начале шага арены
 @socketio.on("input")
 def on_input(data):
     sid=request.sid
-    if sid not in players:return
-    players[sid]["tx"]=float(data.get("targetX",players[sid]["x"]))
-    players[sid]["ty"]=float(data.get("targetY",players[sid]["y"]))
+    arena=arena_of(sid)
+    if arena and isinstance(data, dict):
+        arena.inputs.put(sid, target=(data.get("targetX"), data.get("targetY")), ack=data.get("ack"))
 
 @socketio.on("boost")
 def on_boost(data):
     sid=request.sid
-    if sid in players: players[sid]["boost"]=bool(data.get("state",False))
-
-# ---------- ЛОГИКА ----------
-def handle_pvp():
-    now=time.time()
-    sids=list(players.keys())
-    for i in range(len(sids)):
-        for j in range(i+1,len(sids)):
-            sid_a,sid_b=sids[i],sids[j]
-            a,b=players[sid_a],players[sid_b]
-            key = frozenset({sid_a, sid_b})
-
-
-            dx=b["x"]-a["x"]; dy=b["y"]-a["y"]; dist=sqrt(dx*dx+dy*dy)
-            if dist==0: continue
-
-            overlap=PLAYER_RADIUS*2-dist
-            if overlap>0:
-                nx,ny=dx/dist,dy/dist
-                impulse=overlap*5.0
-                a["vx"]=a.get("vx",0)-nx*impulse
-                a["vy"]=a.get("vy",0)-ny*impulse
-                b["vx"]=b.get("vx",0)+nx*impulse
-                b["vy"]=b.get("vy",0)+ny*impulse
-
-            tip_ax = a["x"] + cos(a["angle"]) * (
-                        PLAYER_RADIUS * a.get("spike_size", 1.0) + SHARP_LEN * a.get("spike_length", 1.0))
-            tip_ay = a["y"] + sin(a["angle"]) * (
-                        PLAYER_RADIUS * a.get("spike_size", 1.0) + SHARP_LEN * a.get("spike_length", 1.0))
-            tip_bx = b["x"] + cos(b["angle"]) * (
-                        PLAYER_RADIUS * b.get("spike_size", 1.0) + SHARP_LEN * b.get("spike_length", 1.0))
-            tip_by = b["y"] + sin(b["angle"]) * (
-                        PLAYER_RADIUS * b.get("spike_size", 1.0) + SHARP_LEN * b.get("spike_length", 1.0))
-
-            if distance(tip_ax,tip_ay,b["x"],b["y"])<PLAYER_RADIUS and distance(tip_bx,tip_by,a["x"],a["y"])>PLAYER_RADIUS:
-                if now-last_hits.get(key,0)>DAMAGE_COOLDOWN:
-                    b["hp"]=max(0,b["hp"]-a["damage"]); last_hits[key]=now
-                    socketio.emit("spark", {"x": b["x"], "y": b["y"]})
-                    b["last_hit_time"] = now
-                    # если игрок B умер — начисляем убийце +30 очков
-                    if b["hp"] <= 0:
-                        old_score = a["score"]
-                        a["score"] += 30
-                        # Проверяем, пересёк ли игрок ближайший порог 50
-                        if (old_score // 50) < (a["score"] // 50):
-                            give_buff_options(sid_a)
-                        socketio.emit("kill_bonus", {"x": a["x"], "y": a["y"], "value": 30})
-            elif distance(tip_bx,tip_by,a["x"],a["y"])<PLAYER_RADIUS and distance(tip_ax,tip_ay,b["x"],b["y"])>PLAYER_RADIUS:
-                if now-last_hits.get(key,0)>DAMAGE_COOLDOWN:
-                    a["hp"]=max(0,a["hp"]-b["damage"]); last_hits[key]=now
-                    socketio.emit("spark", {"x": a["x"], "y": a["y"]})
-                    a["last_hit_time"] = now
-                    # если игрок A умер — начисляем убийце +30 очков
-                    if a["hp"] <= 0:
-                        old_score = b["score"]
-                        b["score"] += 30
-                        if (old_score // 50) < (b["score"] // 50):
-                            give_buff_options(sid_b)
-                        socketio.emit("kill_bonus", {"x": b["x"], "y": b["y"], "value": 30})
-
-
-def apply_pellet_effect(p, pel):
-    p["score"] += 1
-    # каждые 50 очков открываем выбор баффа
-    if p["score"] % 50 == 0:
-        for sid, pl in players.items():
-            if pl is p:
-                give_buff_options(sid)
-                break
-
-def give_buff_options(sid):
-    """Отправляет игроку 3 случайных баффа для выбора"""
-    import random
-    buffs = random.sample(BUFF_POOL, 3)
-    players[sid]["buff_choices"] = buffs
-    socketio.emit("buff_choices", buffs, room=sid)
+    arena=arena_of(sid)
+    if arena and isinstance(data, dict):
+        arena.inputs.put(sid, boost=data.get("state", False))
+
+@socketio.on("rtt")
+def on_rtt():
+    # клиент меряет RTT по подтверждению (ack) — для сверки предсказания движения
+    return True
 
 @socketio.on("choose_buff")
 def choose_buff(data):
-    sid = request.sid
-    if sid not in players:
-        return
-    idx = int(data.get("index", -1))
-    buffs = players[sid].get("buff_choices")
-    if not buffs or not (0 <= idx < len(buffs)):
-        return
-    buff = buffs[idx]
-    p = players[sid]
-    k, v, t = buff["key"], buff["value"], buff["type"]
-    # применяем бафф
-    if t == "add":
-        p[k] = p.get(k, 0) + v
-    elif t == "mult":
-        # для полей с множителями (speed_mult, boost_mult, spike_size, spike_length)
-        p[k] = p.get(k, 1.0) * v
-    p.pop("buff_choices", None)
-
-BUFF_POOL = [
-    {"name": "+10 max HP", "key": "max_hp", "type": "add", "value": 10},
-    {"name": "+2 HP regen/sec", "key": "regen", "type": "add", "value": 2},
-    {"name": "+10 damage", "key": "damage", "type": "add", "value": 10},
-    {"name": "+15% spike size", "key": "spike_size", "type": "mult", "value": 1.15},
-    {"name": "+25% spike length", "key": "spike_length", "type": "mult", "value": 1.25},
-    {"name": "+10% move speed", "key": "speed_mult", "type": "mult", "value": 1.10},
-    {"name": "+20% boost speed", "key": "boost_mult", "type": "add", "value": 0.20},
-]
-
-game_started = False
+    arena = arena_of(request.sid)
+    if arena:
+        arena.world.choose_buff(request.sid, int(data.get("index", -1)))
 
 @socketio.on("connect")
 def on_connect():
-    global game_started
     print(f"[CONNECT] {request.sid}")
-    if not game_started:
-        socketio.start_background_task(game_loop)
-        game_started = True
-        print("🎮 Game loop started.")
-
-def game_loop():
-    last=time.time()
-    while True:
-        now=time.time(); dt=now-last; last=now
-        dead=[]
-        for sid,p in list(players.items()):
-            dx,dy=p["tx"]-p["x"],p["ty"]-p["y"]
-            target_angle=atan2(dy,dx)
-            diff=(target_angle-p["angle"]+3.14159)%(2*3.14159)-3.14159
-            p["angle"]+=max(-ROT_SPEED*dt,min(ROT_SPEED*dt,diff))
-            dist=sqrt(dx*dx+dy*dy)
-            base_speed = PLAYER_SPEED * p.get("speed_mult", 1.0)
-            if p["boost"]:
-                base_speed = max(PLAYER_SPEED * p.get("speed_mult", 1.0),
-                                 220 * BOOST_MULT * p.get("boost_mult", 1.0))
-
-            if dist>1:
-                p["x"]+=cos(p["angle"])*base_speed*dt
-                p["y"]+=sin(p["angle"])*base_speed*dt
-            p["x"]+=p.get("vx",0)*dt; p["y"]+=p.get("vy",0)*dt
-            p["vx"]=p.get("vx",0)*0.88; p["vy"]=p.get("vy",0)*0.88
-            # --- урон от ускорения ---
-            if p["boost"]:
-                p["hp"] = max(0, p["hp"] - p["max_hp"] * 0.15 * dt)
-                p["last_hit_time"] = now  # останавливаем реген пока бустит
-
-            # --- реген ---
-            if p["hp"] > 0 and p["hp"] < p["max_hp"]:
-                last_hit = p.get("last_hit_time", 0)
-                if now - last_hit > 5.0 and not p["boost"]:
-                    p["hp"] = min(p["max_hp"], p["hp"] + p.get("regen", 0) * dt)
-
-            cx, cy = WORLD_CENTER
-            dx, dy = p["x"] - cx, p["y"] - cy
-            dist = sqrt(dx * dx + dy * dy)
-            if dist > WORLD_RADIUS - PLAYER_RADIUS:
-                nx, ny = dx / dist, dy / dist
-                p["x"] = cx + nx * (WORLD_RADIUS - PLAYER_RADIUS)
-                p["y"] = cy + ny * (WORLD_RADIUS - PLAYER_RADIUS)
-            if p["hp"]<=0: dead.append(sid)
-        handle_pvp()
-
-        eaten=set()
-        for sid,p in players.items():
-            for i,pel in enumerate(pellets):
-                if i in eaten: continue
-                if distance(p["x"],p["y"],pel["x"],pel["y"])<=PLAYER_RADIUS+PELLET_RADIUS:
-                    apply_pellet_effect(p,pel); eaten.add(i)
-        if eaten:
-            for idx in sorted(eaten,reverse=True):
-                pellets[idx]=respawn_pellet()
-
-        for sid in dead:
+
+def arena_of(sid):
+    """Арена, где сейчас живёт игрок sid (None — не в игре)"""
+    for arena in matchmaker.arenas:
+        if sid in arena.players:
+            return arena
+    return None
+
+# ---------- АРЕНА ----------
+class Arena:
+    """Сетевая обёртка над sim.World: комната Socket.IO, области видимости,
+    дельта-протокол и свой цикл тиков.
+
+    Цикл запускается с первым игроком и останавливается, когда арена пустеет.
+    """
+
+    def __init__(self, aid):
+        self.id = aid
+        self.room = f"arena-{aid}"
+        self.world = World()
+        self.players = self.world.players  # sid -> Player, тот же dict, что в мире
+        # крупная сетка пеллетов для выборки по области видимости; сдвинутые
+        # пеллеты переносятся в ней в начале рассылки (PelletPool.take_dirty)
+        pool = self.world.pellets
+        self.pellet_view_grid = SpatialGrid(VIEW_CELL)
+        for i in range(len(pool)):
+            self.pellet_view_grid.insert(i, pool.x[i], pool.y[i])
+        self.views = {}  # sid -> (полуширина, полувысота) области видимости
+        self.client_views = {}  # sid -> ClientView: история снимков для дельта-протокола
+        self.pending_deaths = deque()  # (sid, score): dead-уведомления до конца итерации цикла
+        self.effects = []  # (x, y, запись fx): искры и бонусы до ближайшего кадра state
+        self.inputs = InputBuffer(INPUT_LIMIT, INPUT_BURST)
+        self.last_input = {}  # sid -> time.monotonic() последнего input/boost
+        self.hidden = set()  # sid со свёрнутой вкладкой
+        self.next_frame = {}  # sid -> номер рассылки, с которой клиенту снова пора кадр
+        self.send_share = {}  # sid -> доля кадров (< 1) у клиентов, не успевающих принимать
+        self.state_dropped = 0
+        self.lb, self.lb_rev = [], -1  # топ-10 для overview и ревизия лидерборда, с которой он собран
+        self.ticker = FixedTimestep(PHYSICS_RATE, MAX_CATCHUP)
+        self.timer = PhaseTimer(PHASES, window=PHYSICS_RATE * 10)
+        self.broadcasts = 0
+        self.payload_bytes = 0  # байт state в последней замеренной рассылке
+        self.running = False
+
+    def join(self, sid, name, color, spike, view, binary=False):
+        p = self.world.add_player(sid, name, color, spike)
+        self.views[sid] = parse_view(view)
+        self.last_input[sid] = time.monotonic()
+        self.client_views[sid] = ClientView(binary=binary)  # первый кадр после спавна — полный
+        if not self.running:
+            self.running = True
+            socketio.start_background_task(self.run)
+            print(f"🎮 Arena {self.id} loop started.")
+        return p
+
+    def leave(self, sid):
+        self.world.remove_player(sid)
+        self.forget(sid)
+
+    def forget(self, sid):
+        """Сетевое состояние сессии sid; игрок из мира уже убран (ушёл или погиб)"""
+        self.views.pop(sid, None)
+        self.client_views.pop(sid, None)
+        self.inputs.forget(sid)
+        self.last_input.pop(sid, None)
+        self.hidden.discard(sid)
+        self.next_frame.pop(sid, None)
+        self.send_share.pop(sid, None)
+
+    def apply_inputs(self):
+        """Последний ввод каждого клиента — игрокам. Кривые значения пропускаем
+        поштучно: нечисловая цель (nan, inf, 1e999) оставляет прежнюю, ack не
+        целым числом не подтверждает ничего, остальной ввод того же sid идёт"""
+        players, views, last_input = self.players, self.client_views, self.last_input
+        now = time.monotonic()
+        for sid, slot in self.inputs.take().items():
             p = players.get(sid)
-            if not p:
+            if p is None:
                 continue
+            last_input[sid] = now
+            if "target" in slot:
+                try:
+                    tx, ty = slot["target"]
+                    tx = p.x if tx is None else float(tx)
+                    ty = p.y if ty is None else float(ty)
+                except (TypeError, ValueError, OverflowError):
+                    tx = ty = None
+                if tx is not None and isfinite(tx) and isfinite(ty):
+                    p.tx, p.ty = tx, ty
+            if "boost" in slot:
+                p.boost = bool(slot["boost"])
+            ack = slot.get("ack")
+            # bool — тоже int, но ack это номер кадра
+            if type(ack) is int and sid in views:
+                views[sid].ack(ack)
+
+    def dispatch(self, events):
+        """Переводит события симуляции в сообщения Socket.IO.
+
+        Искры и бонусы не рассылаются всей арене: они копятся в effects и
+        уходят в ближайшем кадре state тем, у кого попали в область видимости.
+        """
+        for event in events:
+            kind = event[0]
+            if kind == "spark":
+                x, y = event[1], event[2]
+                self.effects.append((x, y, [protocol.FX_SPARK, round(x, 1), round(y, 1), 0]))
+            elif kind == "kill_bonus":
+                x, y = event[1], event[2]
+                self.effects.append((x, y, [protocol.FX_KILL_BONUS, round(x, 1), round(y, 1), event[3]]))
+            elif kind == "buff_choices":
+                socketio.emit("buff_choices", event[2], to=event[1])
+            elif kind == "dead":
+                # dead уходит в конце итерации, чтобы не ждать внутри тика
+                self.forget(event[1])
+                self.pending_deaths.append((event[1], event[2]))
+
+    def flush_deaths(self):
+        """Рассылает накопленные за итерацию dead — без ожидания внутри тика"""
+        while self.pending_deaths:
+            sid, score = self.pending_deaths.popleft()
             try:
-                socketio.emit("dead", {"score": int(p.get("score", 0))}, to=sid)
-                time.sleep(0.1)
+                socketio.emit("dead", {"score": score}, to=sid)
             except Exception as e:
                 print("Ошибка отправки dead:", e)
-            finally:
-                players.pop(sid, None)
-
-        socketio.emit("state", {"players": players, "pellets": pellets})
-
-        for sid, p in list(players.items()):
-            if p["hp"] <= 0:
-                socketio.emit("dead", {"score": int(p.get("score", 0))}, to=sid)
-                players.pop(sid, None)
-
-        socketio.sleep(1.0/TICK_RATE)
 
+    def broadcast_state(self):
+        """Каждому игроку — дельта по игрокам и пеллетам в его области видимости
+        и эффекты, случившиеся в ней с прошлого кадра.
+
+        Простаивающие клиенты (свёрнутая вкладка или нет input дольше IDLE_AFTER)
+        получают кадр раз в IDLE_EVERY рассылок; эффекты между их кадрами теряются.
+        Клиентам с забитой очередью отправки частота снижается по AIMD: устаревший
+        кадр выбрасывается до сборки, дельта от подтверждённого снимка это переживёт.
+        """
+        players, pool, effects = self.players, self.world.pellets, self.effects
+        self.effects = []
+        xs, ys = pool.x, pool.y
+        view_grid = self.pellet_view_grid
+        for i, (ox, oy) in pool.take_dirty().items():
+            view_grid.remove(i, ox, oy)
+            view_grid.insert(i, xs[i], ys[i])
+        sent = int(time.time() * 1000)  # метка t: клиенты и нагрузочный тест меряют по ней задержку
+        self.broadcasts += 1
+        measure = self.broadcasts % PAYLOAD_SAMPLE == 0
+        size = 0
+        grid = SpatialGrid(VIEW_CELL)
+        for sid, p in players.items():
+            grid.insert(sid, p.x, p.y)
+        n, next_frame, last_input, shares = self.broadcasts, self.next_frame, self.last_input, self.send_share
+        idle_since = time.monotonic() - IDLE_AFTER
+        for sid, me in players.items():
+            if next_frame.get(sid, 0) > n:
+                continue
+            every = IDLE_EVERY if sid in self.hidden or last_input.get(sid, 0) < idle_since else 1
+            share = shares.get(sid, 1.0)
+            backlog = send_backlog(sid)
+            if backlog > SEND_BACKLOG:
+                share = shares[sid] = max(MIN_SEND_SHARE, share / 2)
+                next_frame[sid] = n + max(every, round(1 / share))
+                self.state_dropped += 1
+                continue
+            # долю поднимаем только по пустой очереди: клиент, отстающий на 2–3
+            # пакета, держится на прежней доле, а не качается между полной и половиной
+            if share < 1.0 and backlog == 0:
+                share = min(1.0, share + SEND_SHARE_STEP)
+                if share < 1.0:
+                    shares[sid] = share
+                else:
+                    del shares[sid]
+            next_frame[sid] = n + max(every, round(1 / share))
+            hw, hh = self.views.get(sid, (VIEW_W / 2 + VIEW_MARGIN, VIEW_H / 2 + VIEW_MARGIN))
+            x0, y0, x1, y1 = me.x - hw, me.y - hh, me.x + hw, me.y + hh
+            vis = {}
+            for other in grid.rect(x0, y0, x1, y1):
+                p = players[other]
+                if x0 <= p.x <= x1 and y0 <= p.y <= y1:
+                    vis[p.pid] = p
+            pels = [i for i in view_grid.rect(x0, y0, x1, y1) if x0 <= xs[i] <= x1 and y0 <= ys[i] <= y1]
+            cv = self.client_views.get(sid)
+            if cv is None:
+                cv = self.client_views[sid] = ClientView()
+            frame = cv.frame(vis, pels, pool)
+            frame["t"] = sent
+            if effects:
+                fx = [e for x, y, e in effects if x0 <= x <= x1 and y0 <= y <= y1]
+                if fx:
+                    frame["fx"] = fx
+            if cv.binary:
+                frame = encode_binary(frame)
+                size += len(frame)
+            elif measure:
+                size += len(json.dumps(frame, separators=(",", ":")))
+            socketio.emit("state", frame, to=sid)
+        if measure:
+            self.payload_bytes = size
+
+    def broadcast_overview(self):
+        """Дешёвый общий канал арены: топ-10 и сетка плотности игроков для миникарты.
+
+        Топ ведёт World.leaderboard по ходу игры; здесь он только пересобирается
+        в JSON, если менялся. map — пары [ячейка, уровень] непустых ячеек,
+        ячейка = строка * MINIMAP_COLS + столбец.
+        """
+        board = self.world.leaderboard
+        if board.rev != self.lb_rev:
+            self.lb = [{"pid": p.pid, "name": p.name, "score": p.score} for p in board.top]
+            self.lb_rev = board.rev
+        cw, ch = WORLD_W / MINIMAP_COLS, WORLD_H / MINIMAP_ROWS
+        counts = {}
+        for p in self.players.values():
+            cell = min(MINIMAP_ROWS - 1, max(0, int(p.y / ch))) * MINIMAP_COLS + min(MINIMAP_COLS - 1, max(0, int(p.x / cw)))
+            counts[cell] = counts.get(cell, 0) + 1
+        cells = []
+        for cell, n in counts.items():
+            cells += (cell, min(MINIMAP_LEVELS, n.bit_length()))
+        socketio.emit("overview", {"lb": self.lb, "map": cells}, to=self.room)
+
+    def run(self):
+        """Цикл арены: крутится, пока в ней есть игроки или неразосланные dead"""
+        ticker = self.ticker
+        ticker.reset()
+        # часы симуляции идут ровно по dt на шаг; стартуют с настенного времени
+        sim_time=time.time()
+        next_overview=0
+        next_snapshot=0
+        try:
+            while self.players or self.pending_deaths:
+                steps=ticker.due()
+                if steps:
+                    profiler.begin()
+                    # упавший тик не должен останавливать арену: пишем и крутимся дальше
+                    try:
+                        started=time.monotonic()
+                        timer, clock = self.timer, time.perf_counter
+                        emitting = 0.0
+                        self.apply_inputs()
+                        for _ in range(steps):
+                            sim_time+=ticker.dt
+                            events = self.world.step(ticker.dt, sim_time)
+                            for phase, took in zip(STEP_PHASES, self.world.phases):
+                                timer.add(phase, took)
+                            t = clock()
+                            self.dispatch(events)
+                            emitting += clock() - t
+
+                        if ticker.ticks >= next_snapshot:
+                            t = clock()
+                            self.broadcast_state()
+                            timer.add("state", clock() - t)
+                            next_snapshot = ticker.ticks + SNAPSHOT_EVERY
+                        if ticker.ticks >= next_overview:
+                            t = clock()
+                            self.broadcast_overview()
+                            timer.add("overview", clock() - t)
+                            next_overview = ticker.ticks + max(1, PHYSICS_RATE // OVERVIEW_RATE)
+                        t = clock()
+                        self.flush_deaths()
+                        timer.add("events", emitting + clock() - t)
+                        ticker.finished(time.monotonic()-started)
+                    except Exception:
+                        print(f"⚠️ Arena {self.id}: ошибка в тике {ticker.ticks}")
+                        traceback.print_exc()
+                    finally:
+                        profiler.end()
+
+                socketio.sleep(ticker.delay())
+        finally:
+            self.running = False
+        print(f"💤 Arena {self.id} loop stopped.")
+
+class Matchmaker:
+    """Раскладывает игроков по аренам этого процесса"""
+
+    def __init__(self, count, capacity):
+        self.capacity = capacity
+        self.arenas = [Arena(i) for i in range(count)]
+
+    def place(self):
+        """Самая заполненная арена, где есть место, — чтобы игроки не размазывались
+        по пустым аренам; если мест нет нигде — наименее заполненная"""
+        open_ = [a for a in self.arenas if len(a.players) < self.capacity]
+        if open_:
+            return max(open_, key=lambda a: len(a.players))
+        return min(self.arenas, key=lambda a: len(a.players))
+
+    def players(self):
+        return sum(len(a.players) for a in self.arenas)
+
+    def free(self):
+        return sum(max(0, self.capacity - len(a.players)) for a in self.arenas)
+
+matchmaker = Matchmaker(ARENAS, ARENA_CAPACITY)
+
+def spawn_workers(port, workers):
+    """Поднимает шарды 1..workers-1 дочерними процессами на соседних портах"""
+    host = os.environ.get("PUBLIC_HOST", "localhost")
+    shards = [f"http://{host}:{port + i}" for i in range(workers)]
+    children = []
+    for i in range(1, workers):
+        env = dict(os.environ, PORT=str(port + i), SHARD_ID=str(i), SHARDS=",".join(shards), WORKERS="1")
+        children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+    atexit.register(lambda: [c.terminate() for c in children])
+    return shards
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1 and not SHARDS:
+        SHARDS = spawn_workers(port, workers)
     print(f"🚀 Starting Spike.io server on port {port}")
     socketio.run(app, host="0.0.0.0", port=port)
-
-
-
-
-
@@ -0,0 +1,57 @@
+"""Неизменяемые HTTP-ответы: тело собрано заранее, сжатие и ETag посчитаны один раз."""
+import gzip
+import hashlib
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    try:  # та же API на CFFI — для PyPy и сборок без компилятора
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+        print("⚠️ Модуль brotli не установлен (pip install Brotli) — страница и статика только в gzip.")
+
+IMMUTABLE = "public, max-age=31536000, immutable"  # для URL с хешем содержимого
+
+
+class Asset:
+    """Тело ответа с заранее сжатыми вариантами (br, gzip) и сильными ETag.
+
+    У каждого варианта свой ETag (хеш тела + кодировка), вариант выбирается
+    по Accept-Encoding; совпадение с If-None-Match — ответ 304 без тела.
+    """
+
+    __slots__ = ("mimetype", "cache", "digest", "variants")
+
+    def __init__(self, body, mimetype, cache="no-cache"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.mimetype = mimetype
+        self.cache = cache
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.variants = {None: body}  # кодировка -> байты
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+        self.variants["gzip"] = gzip.compress(body, 9, mtime=0)
+        for enc in ("br", "gzip"):
+            # сжатие без выигрыша не отдаём
+            if enc in self.variants and len(self.variants[enc]) >= len(body):
+                del self.variants[enc]
+
+    def etag(self, encoding):
+        return self.digest[:32] + (f"-{encoding}" if encoding else "")
+
+    def response(self, request):
+        encoding = request.accept_encodings.best_match([e for e in ("br", "gzip") if e in self.variants])
+        etag = self.etag(encoding)
+        headers = {"Cache-Control": self.cache, "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304, headers=headers)
+        else:
+            resp = Response(self.variants[encoding], mimetype=self.mimetype, headers=headers)
+            if encoding:
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        return resp
@@ -0,0 +1,330 @@
+"""Микробенчмарки горячих путей тика.
+
+    python bench.py                              # все случаи, 50/200/500 игроков
+    python bench.py --sizes 100,1000 --only pvp,tick
+    python bench.py --out before.json            # сохранить результат
+    python bench.py --compare before.json        # сравнить с прошлым прогоном
+    python bench.py --check                      # сверить бэкенды физики и отброс при 30/60 Гц
+
+Случаи:
+    pvp            World.handle_pvp — толчки и удары шипами
+    pickup         World.pickup_pellets против PELLET_COUNT пеллетов
+    respawn        PelletPool.respawn — перерождение всех PELLET_COUNT пеллетов
+    encode_json    полный кадр state на N видимых игроков, json.dumps
+    encode_bin     то же, encode_binary
+    broadcast_*    Arena.broadcast_state: AOI, дельты и кодирование для всех N клиентов
+    tick           полная итерация цикла арены: шаг симуляции + рассылка
+
+Сеть не нужна: рассылка уходит в комнаты без подключённых клиентов.
+Результат — JSON: медиана, минимум и p95 времени одного вызова в мс.
+С --compare процесс завершается с кодом 1, если медиана где-то выросла
+больше чем на --threshold — так регрессию видно до выката.
+"""
+import argparse, json, logging, os, platform, random, statistics, subprocess, sys, time
+from math import cos, sin, tau, sqrt, isfinite
+
+import app
+import sim
+from protocol import ClientView, encode_binary
+from sim import World, PelletPool, PELLET_COUNT, WORLD_CENTER
+
+# лог каждого emit (logger=True в app.py) зашумил бы замер рассылки
+logging.disable(logging.CRITICAL)
+
+SIZES = (50, 200, 500)
+DENSITY = 300 * 300  # площадь арены на игрока — как в людном месте
+
+
+# ---------- ПОДГОТОВКА ----------
+def populate(world, n, seed):
+    """n игроков в круге такой площади, чтобы плотность была DENSITY"""
+    rng = random.Random(seed)
+    r = min(sim.WORLD_RADIUS - sim.PLAYER_RADIUS, sqrt(n * DENSITY / 3.14159))
+    cx, cy = WORLD_CENTER
+    for i in range(n):
+        a, d = rng.uniform(0, tau), r * sqrt(rng.random())
+        p = world.add_player(f"s{i}", f"p{i}", "#8ac926", "classic")
+        p.x, p.y = cx + cos(a) * d, cy + sin(a) * d
+        p.angle = rng.uniform(-3.14159, 3.14159)
+        a, d = rng.uniform(0, tau), r * sqrt(rng.random())
+        p.tx, p.ty = cx + cos(a) * d, cy + sin(a) * d
+    return world
+
+
+def make_arena(n, seed, binary=False):
+    arena = app.Arena(f"bench-{n}")
+    populate(arena.world, n, seed)
+    for sid in arena.players:
+        arena.views[sid] = app.parse_view({})
+        arena.client_views[sid] = ClientView(binary=binary)
+    keep_active(arena)
+    return arena
+
+
+def ack_all(arena):
+    """Клиенты подтверждают каждый кадр — рассылка идёт дельтами, как в игре"""
+    for cv in arena.client_views.values():
+        cv.ack(cv.seq)
+
+
+def keep_active(arena):
+    """Все клиенты «только что прислали input» — иначе рассылка сочтёт их
+    простаивающими и будет слать кадр раз в IDLE_EVERY вызовов"""
+    now = time.monotonic()
+    for sid in arena.players:
+        arena.last_input[sid] = now
+
+
+def heal(world):
+    """Возвращает hp, чтобы повторы не меняли состав арены. Игроки помечаются
+    в touched — иначе NumPy-бэкенд перезапишет hp из своих столбцов"""
+    for p in world.players.values():
+        p.hp = p.max_hp
+        world.touched.add(p)
+
+
+# ---------- СЛУЧАИ ----------
+# каждый случай: (n, seed) -> (функция под замер, подготовка перед каждым вызовом или None)
+def case_pvp(n, seed):
+    world = populate(World(), n, seed)
+    clock = [0.0]
+    def run():
+        clock[0] += 1.0  # кулдауны не мешают ударам между повторами
+        world.handle_pvp(1.0 / sim.PHYSICS_RATE, clock[0])
+    return run, lambda: heal(world)
+
+def case_pickup(n, seed):
+    world = populate(World(), n, seed)
+    return world.pickup_pellets, None
+
+def case_respawn(n, seed):
+    pool = PelletPool(PELLET_COUNT)
+    def run():
+        for i in range(PELLET_COUNT):
+            pool.respawn(i)
+        pool.take_dirty()
+    return run, None
+
+def full_frame(n, seed):
+    world = populate(World(), n, seed)
+    vis = {p.pid: p for p in world.players.values()}
+    return vis, range(n), world.pellets
+
+def case_encode_json(n, seed):
+    frame = ClientView().frame(*full_frame(n, seed))
+    return lambda: json.dumps(frame, separators=(",", ":")), None
+
+def case_encode_bin(n, seed):
+    frame = ClientView(binary=True).frame(*full_frame(n, seed))
+    return lambda: encode_binary(frame), None
+
+def broadcast_case(binary):
+    def case(n, seed):
+        arena = make_arena(n, seed, binary)
+        arena.broadcast_state()  # первый кадр полный, замеряем установившийся режим
+        def prepare():
+            ack_all(arena)
+            keep_active(arena)
+            arena.world.step(1.0 / sim.PHYSICS_RATE, time.time())
+            heal(arena.world)
+        return arena.broadcast_state, prepare
+    return case
+
+def case_tick(n, seed):
+    arena = make_arena(n, seed)
+    dt = 1.0 / sim.PHYSICS_RATE
+    clock = [time.time()]
+    def run():
+        clock[0] += dt
+        arena.dispatch(arena.world.step(dt, clock[0]))
+        arena.broadcast_state()
+        arena.flush_deaths()
+    def prepare():
+        ack_all(arena)
+        heal(arena.world)
+        # погибших за прошлый повтор возвращаем, чтобы население не таяло
+        for i in range(n - len(arena.players)):
+            sid = f"r{clock[0]}-{i}"
+            arena.world.add_player(sid, sid, "#8ac926", "classic")
+            arena.views[sid] = app.parse_view({})
+            arena.client_views[sid] = ClientView()
+        keep_active(arena)
+    return run, prepare
+
+CASES = {
+    "pvp": case_pvp,
+    "pickup": case_pickup,
+    "respawn": case_respawn,
+    "encode_json": case_encode_json,
+    "encode_bin": case_encode_bin,
+    "broadcast_json": broadcast_case(False),
+    "broadcast_bin": broadcast_case(True),
+    "tick": case_tick,
+}
+PER_SIZE = {"respawn": False}  # respawn от числа игроков не зависит
+
+
+# ---------- СВЕРКА БЭКЕНДОВ ----------
+CHECK_FIELDS = ("x", "y", "angle", "vx", "vy", "hp")
+BAD_TARGETS = (float("nan"), float("inf"), float("-inf"))
+
+def check_backends(n, seed, ticks=150, tol=1e-6):
+    """Один сценарий на integrate_python и NumpyIntegrator: те же цели,
+    среди них nan и ±inf. True — состояния игроков совпали на каждом тике"""
+    if sim.np is None:
+        print("⚠️ NumPy не установлен — сверять не с чем")
+        return False
+    worlds = []
+    for integrate in (sim.integrate_python, sim.NumpyIntegrator()):
+        random.seed(seed)
+        world = populate(World(), n, seed)
+        world.integrate = integrate
+        worlds.append(world)
+    rng = random.Random(seed)
+    dt, now = 1.0 / sim.PHYSICS_RATE, 0.0
+    cx, cy = WORLD_CENTER
+    for tick in range(ticks):
+        now += dt
+        for sid in list(worlds[0].players):
+            if rng.random() < 0.1:
+                tx = rng.choice(BAD_TARGETS) if rng.random() < 0.3 else cx + rng.uniform(-3000, 3000)
+                ty = cy + rng.uniform(-3000, 3000)
+                if rng.random() < 0.5:
+                    tx, ty = ty, tx
+                for world in worlds:
+                    if sid in world.players:
+                        world.players[sid].tx, world.players[sid].ty = tx, ty
+        # оба шага — с одним состоянием random: баффы и перерождение пеллетов
+        state = random.getstate()
+        for world in worlds:
+            random.setstate(state)
+            world.step(dt, now)
+        a, b = (w.players for w in worlds)
+        if a.keys() != b.keys():
+            print(f"тик {tick}: разный состав игроков")
+            return False
+        for sid, p in a.items():
+            q = b[sid]
+            for f in CHECK_FIELDS:
+                u, v = getattr(p, f), getattr(q, f)
+                if not (isfinite(u) and isfinite(v) and abs(u - v) <= tol * max(1.0, abs(u))):
+                    print(f"тик {tick}: {sid}.{f} python={u} numpy={v}")
+                    return False
+    print(f"бэкенды совпали: {n} игроков, {ticks} тиков, цели с nan/inf")
+    return True
+
+
+def knockback(rate, seconds=1.0):
+    """Расстояние между двумя игроками, стоявшими вплотную, через seconds
+    секунд при частоте физики rate. Шипы смотрят мимо друг друга, цели
+    держатся на месте — остаётся только толчок и затухание"""
+    random.seed(0)
+    world = World()
+    cx, cy = WORLD_CENTER
+    a = world.add_player("a", "a", "#8ac926", "classic")
+    b = world.add_player("b", "b", "#8ac926", "classic")
+    a.x, a.y, b.x, b.y = cx, cy, cx, cy + sim.PLAYER_RADIUS
+    dt, now = 1.0 / rate, 0.0
+    for _ in range(round(seconds * rate)):
+        for p in (a, b):
+            p.tx, p.ty = p.x, p.y
+        now += dt
+        world.step(dt, now)
+    return sqrt((a.x - b.x) ** 2 + (a.y - b.y) ** 2)
+
+def check_knockback(rates=(30, 60), tol=0.05):
+    """Отброс после толчка не должен зависеть от частоты физики больше чем на tol"""
+    dist = {rate: knockback(rate) for rate in rates}
+    base = dist[rates[0]]
+    ok = all(abs(d - base) <= tol * base for d in dist.values())
+    print("отброс за 1 с: " + ", ".join(f"{rate} Гц — {d:.1f}" for rate, d in dist.items()),
+          "" if ok else "  ⚠️ зависит от частоты")
+    return ok
+
+
+# ---------- ЗАМЕР ----------
+def measure(run, prepare, repeat, warmup):
+    times = []
+    for i in range(warmup + repeat):
+        if prepare:
+            prepare()
+        t = time.perf_counter()
+        run()
+        if i >= warmup:
+            times.append(time.perf_counter() - t)
+    times.sort()
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": times[0] * 1000,
+            "p95_ms": times[int(0.95 * (len(times) - 1))] * 1000, "repeat": repeat}
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, path, threshold):
+    """Печатает изменения медиан относительно прошлого прогона; True — есть регрессии"""
+    with open(path) as f:
+        old = {(r["case"], r["n"]): r for r in json.load(f)["results"]}
+    worse = False
+    print(f"\nvs {path}:")
+    for r in results:
+        o = old.get((r["case"], r["n"]))
+        if not o:
+            continue
+        ratio = r["median_ms"] / o["median_ms"] if o["median_ms"] else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark, worse = "  ⚠️ регрессия", True
+        elif ratio < 1 - threshold:
+            mark = "  ускорение"
+        print(f"{r['case']:>15} n={r['n']:<5} {o['median_ms']:9.3f} -> {r['median_ms']:9.3f} ms  x{ratio:.2f}{mark}")
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки тика Spike.io")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="число игроков через запятую")
+    parser.add_argument("--only", help="случаи через запятую: " + ",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="записать результаты в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допуск роста медианы (0.10 = 10%%)")
+    parser.add_argument("--check", action="store_true", help="сверить физику python и numpy вместо замеров")
+    args = parser.parse_args()
+
+    if args.check:
+        ok = all([check_backends(n, args.seed) for n in map(int, args.sizes.split(","))])
+        ok = check_knockback() and ok
+        sys.exit(0 if ok else 1)
+
+    names = args.only.split(",") if args.only else list(CASES)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = []
+    for name in names:
+        for n in sizes if PER_SIZE.get(name, True) else sizes[:1]:
+            random.seed(args.seed)
+            run, prepare = CASES[name](n, args.seed)
+            r = {"case": name, "n": n, **measure(run, prepare, args.repeat, args.warmup)}
+            results.append(r)
+            print(f"{name:>15} n={n:<5} median {r['median_ms']:9.3f} ms  min {r['min_ms']:9.3f}  p95 {r['p95_ms']:9.3f}",
+                  flush=True)
+
+    report = {"meta": {"commit": commit(), "python": platform.python_version(),
+                       "backend": sim.PHYSICS_BACKEND if sim.USE_NUMPY else "python",
+                       "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Буфер ввода клиентов между тиками и ограничение частоты событий."""
+import time
+
+
+class InputBuffer:
+    """Последний ввод каждого клиента до ближайшего шага симуляции.
+
+    Обработчики событий только складывают сырые значения в pending: от sid
+    хранится последнее значение каждого ключа (target, boost, ack), более
+    ранние перезаписываются и считаются в coalesced. Разбор и применение —
+    в цикле арены, через take() в начале шага.
+
+    Частота событий от одного sid меряется ведром токенов: rate в секунду,
+    запас burst. События сверх лимита считаются в limited, но значение всё
+    равно записывается: в pending и так одно значение на ключ, а выброшенный
+    boost=False клиент повторно не шлёт — игрок бустил бы до смерти.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets = {}  # sid -> [токены, время последнего пополнения]
+        self.pending = {}  # sid -> {ключ: сырое значение}
+        self.limited = 0
+        self.coalesced = 0
+
+    def allow(self, sid):
+        """Забирает токен из ведра sid; False — лимит исчерпан"""
+        now = self.clock()
+        bucket = self.buckets.get(sid)
+        if bucket is None:
+            bucket = self.buckets[sid] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self.limited += 1
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def put(self, sid, **values):
+        self.allow(sid)  # сверх лимита только считаем, последнее значение нужно
+        slot = self.pending.get(sid)
+        if slot is None:
+            self.pending[sid] = values
+            return
+        for key in values:
+            if key in slot:
+                self.coalesced += 1
+                break
+        slot.update(values)
+
+    def take(self):
+        """Накопленный ввод {sid: {ключ: значение}}; буфер очищается"""
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def forget(self, sid):
+        self.buckets.pop(sid, None)
+        self.pending.pop(sid, None)
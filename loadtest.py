@@ -0,0 +1,320 @@
+"""Нагрузочный тест: много Socket.IO-клиентов против локального сервера.
+
+    python loadtest.py                          # 50, 200 и 500 ботов, сервер запускается сам
+    python loadtest.py --bots 100,1000 --fmt bin --duration 20
+    python loadtest.py --url http://localhost:5000 --server-pid 1234
+
+Боты ведут себя как браузер: spawn, input (с ack) с частотой INPUT_RATE, boost,
+выбор баффа по buff_choices и новый spawn после dead. Для каждого уровня
+печатаются время тика сервера (из /metrics), размер и частота кадров state,
+задержка доставки state (по серверной метке t) и загрузка CPU сервера и ботов.
+Всё работает через localhost, поэтому часы сервера и ботов общие.
+
+Ботов держат несколько процессов-генераторов (--procs), чтобы упиралось
+в сервер, а не в один event loop клиента.
+"""
+import argparse, asyncio, json, os, random, re, socket, subprocess, sys, time, urllib.request
+from math import cos, sin, tau, sqrt
+
+import socketio
+
+from protocol import BIN_HEADER
+from sim import WORLD_CENTER, WORLD_RADIUS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INPUT_RATE = int(os.environ.get("INPUT_RATE", 30))  # как у клиента с тем же INPUT_RATE у сервера
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# ---------- БОТ ----------
+class Stats:
+    """Счётчики одного процесса-генератора за окно замера"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.bytes = 0
+        self.latency = {}  # мс -> сколько кадров
+        self.deaths = 0
+        self.buffs = 0
+
+    def state(self, size, t):
+        self.frames += 1
+        self.bytes += size
+        ms = (int(time.time() * 1000) - t) & 0xFFFFFFFF  # в бинарном кадре t берётся mod 2^32
+        if ms < 60000:
+            self.latency[ms] = self.latency.get(ms, 0) + 1
+
+
+class Bot:
+    def __init__(self, url, n, args, stats):
+        self.url, self.n, self.args, self.stats = url, n, args, stats
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.alive = False
+        self.seq = 0
+        self.target = WORLD_CENTER
+        self.boost = False
+        self.sio.on("welcome", self.on_welcome)
+        self.sio.on("state", self.on_state)
+        self.sio.on("dead", self.on_dead)
+        self.sio.on("buff_choices", self.on_buffs)
+
+    async def on_welcome(self, data):
+        self.alive = True
+        self.seq = 0
+
+    async def on_state(self, d):
+        if isinstance(d, (bytes, bytearray)):
+            _, seq, _, t, *_ = BIN_HEADER.unpack_from(d)
+            self.stats.state(len(d), t)
+        else:
+            seq = d["s"]
+            self.stats.state(len(json.dumps(d, separators=(",", ":"))), d.get("t", 0))
+        self.seq = seq
+
+    async def on_dead(self, data):
+        self.alive = False
+        self.stats.deaths += 1
+
+    async def on_buffs(self, buffs):
+        self.stats.buffs += 1
+        await self.sio.emit("choose_buff", {"index": random.randrange(len(buffs))})
+
+    async def spawn(self):
+        await self.sio.emit("spawn", {"name": f"bot{self.n}", "view": {"w": 1920, "h": 1080},
+                                      "fmt": self.args.fmt})
+
+    async def run(self, stop):
+        try:
+            await self.sio.connect(self.url, transports=self.args.transport.split(","), wait_timeout=30)
+            await self.play(stop)
+        finally:
+            await self.sio.disconnect()
+
+    async def play(self, stop):
+        await self.spawn()
+        dt = 1.0 / INPUT_RATE
+        tick = 0
+        # боты стартуют вразнобой, чтобы input не приходил пачкой в один момент
+        await asyncio.sleep(random.random() * dt)
+        while not stop.is_set():
+            tick += 1
+            if self.alive:
+                if tick % (2 * INPUT_RATE) == 1:
+                    a, r = random.uniform(0, tau), WORLD_RADIUS * sqrt(random.random())
+                    self.target = (WORLD_CENTER[0] + cos(a) * r, WORLD_CENTER[1] + sin(a) * r)
+                x, y = self.target
+                await self.sio.emit("input", {"targetX": x, "targetY": y, "ack": self.seq})
+                if tick % INPUT_RATE == 0:
+                    boost = random.random() < 0.2
+                    if boost != self.boost:
+                        self.boost = boost
+                        await self.sio.emit("boost", {"state": boost})
+            elif tick % INPUT_RATE == 0:
+                await self.spawn()
+            await asyncio.sleep(dt)
+
+
+async def generator(args):
+    """Один процесс-генератор: подключает --bots ботов, печатает ready, меряет --duration"""
+    stats = Stats()
+    stop = asyncio.Event()
+    bots = [Bot(args.url, args.offset + i, args, stats) for i in range(args.bots)]
+    tasks = []
+    for i in range(0, len(bots), 25):  # подключаемся пачками, без лавины рукопожатий
+        tasks += [asyncio.create_task(b.run(stop)) for b in bots[i:i + 25]]
+        await asyncio.sleep(0.2)
+    await asyncio.sleep(args.warmup)
+    stats.reset()
+    cpu = time.process_time()
+    print("ready", flush=True)
+    await asyncio.sleep(args.duration)
+    report = {"frames": stats.frames, "bytes": stats.bytes, "latency": stats.latency,
+              "deaths": stats.deaths, "buffs": stats.buffs,
+              "failed": sum(t.done() and t.exception() is not None for t in tasks),
+              "cpu": time.process_time() - cpu}
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(json.dumps(report), flush=True)
+
+
+# ---------- СЕРВЕР ----------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    env = dict(os.environ, PORT=str(port))
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "app.py")], env=env, cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + "/load", timeout=1).read()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                sys.exit("сервер не запустился")
+            time.sleep(0.1)
+    proc.kill()
+    sys.exit("сервер не отвечает")
+
+
+def scrape(url, timeout=5):
+    """Метрики тика из /metrics: {(имя, stat): [значения по аренам]};
+    None — сервер так перегружен, что не ответил"""
+    try:
+        text = urllib.request.urlopen(url + "/metrics", timeout=timeout).read().decode()
+    except OSError:
+        return None
+    out = {}
+    for m in re.finditer(r'^(spikeio_\w+)\{([^}]*)\} (\S+)$', text, re.M):
+        stat = re.search(r'stat="(\w+)"', m.group(2))
+        out.setdefault((m.group(1), stat and stat.group(1)), []).append(float(m.group(3)))
+    return out
+
+
+def cpu_seconds(pid):
+    """utime + stime процесса (Linux, /proc)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLK_TCK
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def percentile(hist, q):
+    total = sum(hist.values())
+    if not total:
+        return float("nan")
+    seen = 0
+    for ms in sorted(hist):
+        seen += hist[ms]
+        if seen >= q * total:
+            return ms
+    return max(hist)
+
+
+def run_level(args, url, pid, bots):
+    procs = max(1, min(args.procs, bots))
+    share = [bots // procs + (i < bots % procs) for i in range(procs)]
+    cmd = [sys.executable, os.path.abspath(__file__), "--generator", "--url", url, "--fmt", args.fmt,
+           "--transport", args.transport, "--warmup", str(args.warmup), "--duration", str(args.duration)]
+    gens, offset = [], 0
+    for n in share:
+        gens.append(subprocess.Popen(cmd + ["--bots", str(n), "--offset", str(offset)],
+                                     stdout=subprocess.PIPE, text=True, cwd=HERE))
+        offset += n
+    for g in gens:
+        if g.stdout.readline().strip() != "ready":
+            sys.exit("генератор ботов упал")
+
+    before, cpu0, t0 = scrape(url, 30), cpu_seconds(pid) if pid else None, time.monotonic()
+    samples = []  # время последней итерации цикла, по всем аренам
+    while time.monotonic() - t0 < args.duration:
+        time.sleep(0.25)
+        m = scrape(url, 1)
+        if m:
+            samples += m.get(("spikeio_tick_work_seconds", "last"), [])
+    after, cpu1, wall = scrape(url, 30), cpu_seconds(pid) if pid else None, time.monotonic() - t0
+
+    reports = [json.loads(g.stdout.readline()) for g in gens]
+    for g in gens:
+        g.wait()
+    latency = {}
+    for r in reports:
+        for ms, n in r["latency"].items():
+            latency[int(ms)] = latency.get(int(ms), 0) + n
+    frames = sum(r["frames"] for r in reports)
+    def delta(name):
+        if before is None or after is None:
+            return None
+        return sum(after.get((name, None), [])) - sum(before.get((name, None), []))
+    ticks = delta("spikeio_ticks_total")
+    samples.sort()
+    return {
+        "bots": bots,
+        "tick_ms_avg": 1000 * max(after.get(("spikeio_tick_work_seconds", "avg"), [0])) if after else None,
+        "tick_ms_p95": 1000 * samples[int(0.95 * (len(samples) - 1))] if samples else None,
+        "tick_ms_max": 1000 * samples[-1] if samples else None,
+        "ticks_per_second": ticks / wall if ticks is not None else None,
+        "overruns": delta("spikeio_tick_overruns_total"),
+        "skipped": delta("spikeio_ticks_skipped_total"),
+        "state_dropped": delta("spikeio_state_dropped_total"),
+        "throttled_max": max(after.get(("spikeio_clients_throttled", None), [0])) if after else None,
+        "state_per_bot_per_second": frames / bots / args.duration,
+        "state_bytes_avg": sum(r["bytes"] for r in reports) / frames if frames else 0,
+        "latency_ms_p50": percentile(latency, 0.50),
+        "latency_ms_p95": percentile(latency, 0.95),
+        "latency_ms_p99": percentile(latency, 0.99),
+        "server_cpu": (cpu1 - cpu0) / wall if cpu0 is not None and cpu1 is not None else None,
+        "bots_cpu": sum(r["cpu"] for r in reports) / args.duration,
+        "deaths": sum(r["deaths"] for r in reports),
+        "buffs": sum(r["buffs"] for r in reports),
+        "failed": sum(r["failed"] for r in reports),
+    }
+
+
+def fmt(v, spec=".1f"):
+    return "—" if v is None else format(v, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера Spike.io")
+    parser.add_argument("--bots", default="50,200,500", help="уровни нагрузки через запятую")
+    parser.add_argument("--url", help="уже запущенный сервер (по умолчанию поднимается свой)")
+    parser.add_argument("--server-pid", type=int, help="pid сервера для замера CPU при --url")
+    parser.add_argument("--fmt", choices=("json", "bin"), default="json", help="формат кадров state")
+    parser.add_argument("--transport", default="websocket", help="транспорты Engine.IO у ботов")
+    parser.add_argument("--procs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="процессов-генераторов ботов")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--json", help="записать результаты в файл")
+    parser.add_argument("--generator", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--offset", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generator:
+        args.bots = int(args.bots)
+        asyncio.run(generator(args))
+        return
+
+    server = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.server_pid
+    else:
+        server, url = start_server(free_port())
+        pid = server.pid
+    results = []
+    try:
+        print(f"{'bots':>5} {'tick ms avg/p95/max':>20} {'over':>5} {'skip':>5} {'state/s':>8} "
+              f"{'state B':>8} {'lat ms p50/p95/p99':>19} {'srv CPU':>8} {'bots CPU':>9}")
+        for bots in [int(b) for b in args.bots.split(",")]:
+            r = run_level(args, url, pid, bots)
+            results.append(r)
+            tick = f"{fmt(r['tick_ms_avg'])}/{fmt(r['tick_ms_p95'])}/{fmt(r['tick_ms_max'])}"
+            lat = f"{r['latency_ms_p50']}/{r['latency_ms_p95']}/{r['latency_ms_p99']}"
+            cpu = "—" if r["server_cpu"] is None else f"{r['server_cpu']:.0%}"
+            print(f"{bots:>5} {tick:>20} {fmt(r['overruns'], '.0f'):>5} {fmt(r['skipped'], '.0f'):>5} "
+                  f"{r['state_per_bot_per_second']:>8.1f} {r['state_bytes_avg']:>8.0f} {lat:>19} "
+                  f"{cpu:>8} {r['bots_cpu']:>9.0%}", flush=True)
+            if r["failed"]:
+                print(f"      ⚠️ {r['failed']} ботов не смогли подключиться")
+            time.sleep(1)  # арены пустеют и останавливают свои циклы
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
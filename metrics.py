@@ -0,0 +1,117 @@
+"""Замеры тика: таймеры фаз со скользящими перцентилями и семплирующий профайлер."""
+import os
+import sys
+from collections import deque
+
+try:
+    # при eventlet.monkey_patch() нужен настоящий поток ОС, а не гринлет
+    from eventlet.patcher import original
+    _threading, _time = original("threading"), original("time")
+except ImportError:
+    import threading as _threading, time as _time
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class PhaseTimer:
+    """Длительности фаз тика за последние window замеров.
+
+    На горячем пути только append в deque; перцентили считаются при чтении.
+    """
+
+    def __init__(self, phases, window=300):
+        self.samples = {ph: deque(maxlen=window) for ph in phases}
+        self.sums = dict.fromkeys(phases, 0.0)
+        self.counts = dict.fromkeys(phases, 0)
+
+    def add(self, phase, seconds):
+        self.samples[phase].append(seconds)
+        self.sums[phase] += seconds
+        self.counts[phase] += 1
+
+    def quantiles(self, phase):
+        xs = sorted(self.samples[phase])
+        if not xs:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: xs[min(len(xs) - 1, int(q * len(xs)))] for q in QUANTILES}
+
+
+def summary(name, text, timers):
+    """Prometheus summary по таймерам {значение метки arena: PhaseTimer}"""
+    lines = [f"# HELP {name} {text}", f"# TYPE {name} summary"]
+    for label, timer in timers.items():
+        for phase in timer.samples:
+            for q, v in timer.quantiles(phase).items():
+                lines.append(f'{name}{{arena="{label}",phase="{phase}",quantile="{q}"}} {v:.6f}')
+            lines.append(f'{name}_sum{{arena="{label}",phase="{phase}"}} {timer.sums[phase]:.6f}')
+            lines.append(f'{name}_count{{arena="{label}",phase="{phase}"}} {timer.counts[phase]}')
+    return lines
+
+
+class SamplingProfiler:
+    """Семплирующий профайлер тиков.
+
+    Отдельный поток ОС каждые interval секунд снимает стек главного потока —
+    там крутятся все гринлеты, включая циклы арен. Стеки копятся только между
+    begin() и end(), которые цикл арены вызывает вокруг своей работы, и только
+    ближайшие ticks итераций. Результат — свёрнутые стеки (folded) для flamegraph.pl
+    или speedscope: «корень;...;лист число_семплов».
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.ident = _threading.get_ident()
+        self.counts = {}
+        self.left = 0
+        self.recording = False
+        self.done = _threading.Event()
+        self.done.set()
+
+    @property
+    def active(self):
+        return not self.done.is_set()
+
+    def start(self, ticks):
+        if self.active:
+            return False
+        self.counts = {}
+        self.left = ticks
+        self.done.clear()
+        # иначе поток-семплер получает GIL не чаще раза в 5 мс
+        self.switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch, self.interval))
+        _threading.Thread(target=self.sample, daemon=True, name="tick-profiler").start()
+        return True
+
+    def begin(self):
+        if self.left > 0:
+            self.recording = True
+
+    def end(self):
+        if self.recording:
+            self.recording = False
+            self.left -= 1
+            if self.left <= 0:
+                self.done.set()
+
+    def sample(self):
+        while not self.done.is_set():
+            if self.recording:
+                frame = sys._current_frames().get(self.ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            _time.sleep(self.interval)
+        sys.setswitchinterval(self.switch)
+
+    def stop(self):
+        self.left = 0
+        self.recording = False
+        self.done.set()
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.counts.items()))
@@ -0,0 +1,148 @@
+"""Дельта-протокол состояния.
+
+Для каждого клиента сервер помнит последние отправленные снимки и шлёт
+только разницу с последним снимком, который клиент подтвердил (ack).
+Кадр state:
+    s  — номер снимка
+    b  — номер базового снимка (0 — полный снимок, база пустая)
+    t  — серверное время отправки, мс (для замера задержки и интерполяции)
+    p  — {pid: {изменившиеся динамические поля}}
+    ps — {pid: {статичные поля}} — при появлении в зоне видимости и после баффа
+    pr — [pid] — ушли из зоны видимости / умерли
+    f  — {idx: [x, y, color]} — новые/переродившиеся пеллеты
+    fr — [idx] — пеллеты, ушедшие из зоны видимости
+    fx — [[вид, x, y, значение]] — эффекты с прошлого кадра в зоне видимости
+         (FX_SPARK — искры от удара, FX_KILL_BONUS — бонус за убийство);
+         в дельту не входят: кадр несёт только свежие эффекты
+
+Тот же кадр можно упаковать в бинарный вид (encode_binary) — записи
+фиксированной длины, little-endian:
+    заголовок  <B I I I H H H H H I: версия, s, b, t mod 2^32, |p|, |pr|, |f|, |fr|, |fx|, длина ps
+    p          <H H H H H I: pid, x, y, angle, hp, score
+    pr, fr     <H
+    f          <H H H B: idx, x, y, индекс цвета в палитре
+    fx         <B H H H: вид, x, y, значение
+    ps         UTF-8 JSON (меняется редко, поэтому без фиксированной раскладки)
+Координаты квантуются с шагом 1/POS_SCALE, угол — 1/65536 оборота, hp — 1/HP_SCALE.
+"""
+import json
+import struct
+from math import tau
+
+DYNAMIC_FIELDS = ("x", "y", "angle", "hp", "score")
+STATIC_FIELDS = ("name", "color", "spike", "max_hp", "regen", "damage", "spike_size", "spike_length",
+                 "speed_mult", "boost_mult")  # множители скорости — для предсказания движения на клиенте
+HISTORY = 32  # сколько неподтверждённых снимков помнить на клиента
+
+BIN_VERSION = 3
+POS_SCALE = 2
+HP_SCALE = 10
+ANGLE_SCALE = 65536 / tau
+BIN_HEADER = struct.Struct("<BIIIHHHHHI")
+
+FX_SPARK, FX_KILL_BONUS = 0, 1  # виды эффектов в fx
+
+
+def dynamic_state(p):
+    """Динамические поля игрока, округлённые до точности, видимой на экране."""
+    return (round(p.x, 1), round(p.y, 1), round(p.angle, 3), round(p.hp, 1), p.score)
+
+
+def static_state(p):
+    return {k: getattr(p, k) for k in STATIC_FIELDS}
+
+
+class ClientView:
+    """История снимков одного клиента и номер последнего подтверждённого.
+
+    binary=True — клиент получает кадры через encode_binary; тогда в p
+    лежит полная запись динамики изменившегося игрока, а не только разница.
+    """
+
+    __slots__ = ("seq", "acked", "history", "binary")
+
+    def __init__(self, binary=False):
+        self.binary = binary
+        self.seq = 0
+        self.acked = 0
+        self.history = {}  # seq -> (динамика игроков, ревизии статики, версии пеллетов)
+
+    def ack(self, seq):
+        if seq <= self.acked or seq not in self.history:
+            return
+        self.acked = seq
+        for s in [s for s in self.history if s < seq]:
+            del self.history[s]
+
+    def frame(self, players, pellets, pool):
+        """Кадр для клиента по видимым игрокам {pid: p} и слотам пеллетов pool."""
+        base = self.history.get(self.acked)
+        if base is None:
+            self.acked = 0
+            base = ({}, {}, {})
+        base_dyn, base_rev, base_pel = base
+
+        dyn, revs, vers = {}, {}, {}
+        out_p, out_s, out_f = {}, {}, {}
+        for pid, p in players.items():
+            cur = dynamic_state(p)
+            dyn[pid] = cur
+            old = base_dyn.get(pid)
+            if self.binary:
+                if old != cur:
+                    out_p[pid] = cur
+            elif old is None:
+                out_p[pid] = dict(zip(DYNAMIC_FIELDS, cur))
+            elif old != cur:
+                out_p[pid] = {k: v for k, v, o in zip(DYNAMIC_FIELDS, cur, old) if v != o}
+            revs[pid] = p.rev
+            if base_rev.get(pid) != p.rev:
+                out_s[pid] = static_state(p)
+        xs, ys, colors, versions = pool.x, pool.y, pool.color, pool.version
+        for idx in pellets:
+            v = vers[idx] = versions[idx]
+            if base_pel.get(idx) != v:
+                c = colors[idx]
+                out_f[idx] = [round(xs[idx], 1), round(ys[idx], 1), c if self.binary else pool.colors[c]]
+
+        frame = {"s": self.seq + 1, "b": self.acked}
+        if out_p: frame["p"] = out_p
+        if out_s: frame["ps"] = out_s
+        removed = [pid for pid in base_dyn if pid not in dyn]
+        if removed: frame["pr"] = removed
+        if out_f: frame["f"] = out_f
+        gone = [idx for idx in base_pel if idx not in vers]
+        if gone: frame["fr"] = gone
+
+        self.seq += 1
+        self.history[self.seq] = (dyn, revs, vers)
+        if len(self.history) > HISTORY:
+            # клиент давно не подтверждал — следующий кадр будет полным
+            self.history = {self.seq: self.history[self.seq]}
+            self.acked = 0
+        return frame
+
+
+def encode_binary(frame):
+    """Упаковывает кадр ClientView(binary=True): цвет пеллета в нём уже индекс палитры."""
+    p = frame.get("p", {})
+    pr = frame.get("pr", ())
+    f = frame.get("f", {})
+    fr = frame.get("fr", ())
+    fx = frame.get("fx", ())
+    ps = json.dumps(frame["ps"], separators=(",", ":")).encode() if "ps" in frame else b""
+
+    vals = []
+    for pid, (x, y, angle, hp, score) in p.items():
+        vals += (pid, round(x * POS_SCALE), round(y * POS_SCALE),
+                 round(angle % tau * ANGLE_SCALE) & 0xFFFF, min(0xFFFF, round(hp * HP_SCALE)), score)
+    vals += pr
+    for idx, (x, y, color) in f.items():
+        vals += (idx, round(x * POS_SCALE), round(y * POS_SCALE), color)
+    vals += fr
+    for kind, x, y, value in fx:
+        vals += (kind, round(x * POS_SCALE), round(y * POS_SCALE), min(0xFFFF, value))
+    fmt = "<" + "HHHHHI" * len(p) + "H" * len(pr) + "HHHB" * len(f) + "H" * len(fr) + "BHHH" * len(fx)
+    head = BIN_HEADER.pack(BIN_VERSION, frame["s"], frame["b"], frame.get("t", 0) & 0xFFFFFFFF,
+                           len(p), len(pr), len(f), len(fr), len(fx), len(ps))
+    return head + struct.pack(fmt, *vals) + ps
@@ -0,0 +1,54 @@
+"""Планировщик тиков с фиксированным шагом симуляции."""
+import time
+
+
+class FixedTimestep:
+    """Фиксированный шаг dt = 1/rate, сон только до следующего дедлайна.
+
+    Если цикл отстал, due() возвращает несколько шагов подряд (догон),
+    но не больше max_catchup — остальное выбрасывается и считается в skipped,
+    чтобы после долгого фриза сервер не «проматывал» секунды симуляции.
+    """
+
+    def __init__(self, rate, max_catchup=5, clock=time.monotonic):
+        self.rate = rate
+        self.dt = 1.0 / rate
+        self.max_catchup = max_catchup
+        self.clock = clock
+        self.deadline = None
+        self.ticks = 0          # выполненные шаги симуляции
+        self.skipped = 0        # шаги, выброшенные из-за лимита догона
+        self.overruns = 0       # итерации, где работа заняла больше dt
+        self.work = 0.0         # длительность последней итерации, с
+        self.work_avg = 0.0     # скользящее среднее (EWMA) длительности
+
+    def reset(self):
+        """Начать отсчёт заново (после простоя догонять нечего)."""
+        self.deadline = None
+
+    def due(self):
+        """Сколько шагов симуляции выполнить сейчас (0 — дедлайн ещё не наступил)."""
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+        if now < self.deadline:
+            return 0
+        steps = int((now - self.deadline) / self.dt) + 1
+        if steps > self.max_catchup:
+            self.skipped += steps - self.max_catchup
+            self.deadline += (steps - self.max_catchup) * self.dt
+            steps = self.max_catchup
+        self.deadline += steps * self.dt
+        self.ticks += steps
+        return steps
+
+    def finished(self, work):
+        """Учитывает длительность итерации (все шаги + рассылка)."""
+        self.work = work
+        self.work_avg += (work - self.work_avg) * 0.05
+        if work > self.dt:
+            self.overruns += 1
+
+    def delay(self):
+        """Сколько спать до следующего дедлайна."""
+        return max(0.0, self.deadline - self.clock())
@@ -0,0 +1,636 @@
+"""Симуляция арены без сети.
+
+World.step() двигает мир на dt и возвращает список событий — кортежей:
+    ("spark", x, y)                — попадание шипом
+    ("kill_bonus", x, y, value)    — бонус убийце
+    ("buff_choices", sid, buffs)   — игроку предложены баффы
+    ("dead", sid, score)           — игрок погиб и убран из мира
+Рассылкой событий клиентам занимается сетевой слой (app.py).
+
+Без сервера, с ботами по скрипту:
+    python sim.py --bots 200 --ticks 3000
+"""
+import os, random, time, heapq, argparse
+from array import array
+from math import sqrt, atan2, cos, sin, tau, isfinite
+from operator import attrgetter
+from time import perf_counter
+
+from spatial import SpatialGrid
+
+try:
+    import numpy as np
+except ImportError:  # NumPy нужен только для PHYSICS_BACKEND=numpy
+    np = None
+
+
+# ---------- ПАРАМЕТРЫ ----------
+WORLD_W, WORLD_H = 20000, 12000
+WORLD_RADIUS = min(WORLD_W, WORLD_H) // 2
+WORLD_CENTER = (WORLD_W / 2, WORLD_H / 2)
+PELLET_COUNT = 1000
+PELLET_RADIUS = 6
+PLAYER_RADIUS = 22
+PLAYER_SPEED = 220
+BOOST_MULT = 2.0
+ROT_SPEED = 4.0
+PHYSICS_RATE = int(os.environ.get("PHYSICS_RATE", 30))  # шагов симуляции в секунду
+TUNED_RATE = 30  # частота, под которую подобраны затухание скорости и сила толчка
+# "python" — поштучный шаг движения, "numpy" — векторный (выгоден от сотен игроков)
+PHYSICS_BACKEND = os.environ.get("PHYSICS_BACKEND", "python")
+BASE_DAMAGE = 50
+MAX_HP = 100
+SHARP_LEN = 12
+DAMAGE_COOLDOWN = 0.6
+PUSH_STRENGTH = 10.0
+VIEW_CELL = 512                      # ячейка сетки для выборки по области видимости
+PELLET_COLORS = ["#ff4b4b", "#3adb40", "#3da9ff"]  # приятные голубые оттенки
+
+BUFF_POOL = [
+    {"name": "+10 max HP", "key": "max_hp", "type": "add", "value": 10},
+    {"name": "+2 HP regen/sec", "key": "regen", "type": "add", "value": 2},
+    {"name": "+10 damage", "key": "damage", "type": "add", "value": 10},
+    {"name": "+15% spike size", "key": "spike_size", "type": "mult", "value": 1.15},
+    {"name": "+25% spike length", "key": "spike_length", "type": "mult", "value": 1.25},
+    {"name": "+10% move speed", "key": "speed_mult", "type": "mult", "value": 1.10},
+    {"name": "+20% boost speed", "key": "boost_mult", "type": "add", "value": 0.20},
+]
+
+STEP_PHASES = ("move", "pvp", "deaths", "pickup")  # порядок World.phases
+SPAWN_BATCH = 4096  # сколько точек появления пеллетов готовить за раз
+MAX_PID = 0xFFFF    # pid уходит в бинарный кадр как H
+
+# ---------- ИГРОК ----------
+class Player:
+    """Состояние игрока; __slots__ вместо dict — меньше памяти и быстрее доступ в тике"""
+    __slots__ = ("sid", "pid", "rev", "x", "y", "tx", "ty", "angle", "vx", "vy",
+                 "hp", "max_hp", "damage", "regen", "speed_mult", "boost_mult",
+                 "spike_size", "spike_length", "score", "boost", "last_hit_time",
+                 "name", "color", "spike", "buff_choices", "cooldowns")
+
+    def __init__(self, sid, pid, name, color, spike, x, y):
+        self.sid = sid
+        self.pid = pid  # короткий числовой id: ключ в кадрах вместо sid
+        self.rev = 0    # ревизия статичных полей, растёт с каждым баффом
+        self.x = self.tx = x
+        self.y = self.ty = y
+        self.angle = 0.0
+        self.vx = self.vy = 0.0
+        self.hp = self.max_hp = MAX_HP
+        self.damage = BASE_DAMAGE
+        self.regen = 5.0
+        self.speed_mult = self.boost_mult = 1.0
+        self.spike_size = self.spike_length = 1.0
+        self.score = 0
+        self.boost = False
+        self.last_hit_time = 0
+        self.name, self.color, self.spike = name, color, spike
+        self.buff_choices = None
+        # кулдауны урона: sid соперника -> до какого времени пара не бьёт друг друга
+        self.cooldowns = {}
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k != "cooldowns"}
+
+# ---------- УТИЛИТЫ ----------
+def distance(ax, ay, bx, by):
+    return sqrt((ax-bx)**2 + (ay-by)**2)
+
+def spike_reach(p):
+    """Расстояние от центра игрока до кончика шипа"""
+    return PLAYER_RADIUS * p.spike_size + SHARP_LEN * p.spike_length
+
+# ---------- ПЕЛЛЕТЫ ----------
+def spawn_points(n, rng=random):
+    """n равномерных точек в круге арены: r = R·√u, без отбраковки"""
+    cx, cy = WORLD_CENTER
+    R = WORLD_RADIUS - PELLET_RADIUS
+    if np is not None:
+        gen = np.random.default_rng(rng.getrandbits(64))  # сид из random — прогон воспроизводим
+        r = R * np.sqrt(gen.random(n))
+        a = gen.random(n) * tau
+        return array("d", (cx + r * np.cos(a)).tolist()), array("d", (cy + r * np.sin(a)).tolist())
+    xs, ys = array("d"), array("d")
+    for _ in range(n):
+        r, a = R * sqrt(rng.random()), rng.random() * tau
+        xs.append(cx + r * cos(a))
+        ys.append(cy + r * sin(a))
+    return xs, ys
+
+
+class PelletPool:
+    """Пеллеты арены в массивах фиксированного размера: слот i — x[i], y[i],
+    индекс цвета color[i] в colors и версия version[i] (растёт при перерождении).
+
+    Съеденный пеллет не удаляется, а переезжает в следующую заготовленную
+    точку появления. Сдвинутые слоты копятся в dirty (слот -> старые x, y),
+    сетевой слой забирает их через take_dirty() и обновляет свои индексы.
+    """
+
+    __slots__ = ("x", "y", "color", "version", "colors", "dirty", "next_version", "spawn_x", "spawn_y", "spawn_i")
+
+    def __init__(self, size, colors=PELLET_COLORS):
+        self.colors = colors
+        self.spawn_x = self.spawn_y = ()
+        self.spawn_i = 0
+        self.x = array("d", bytes(8 * size))
+        self.y = array("d", bytes(8 * size))
+        self.color = array("B", bytes(size))
+        self.version = array("Q", bytes(8 * size))
+        self.next_version = 1
+        self.dirty = {}
+        for i in range(size):
+            self.respawn(i)
+        self.dirty.clear()
+
+    def __len__(self):
+        return len(self.x)
+
+    def respawn(self, i):
+        """Переносит пеллет i в новую точку, с новым цветом и версией"""
+        if self.spawn_i >= len(self.spawn_x):
+            self.spawn_x, self.spawn_y = spawn_points(SPAWN_BATCH)
+            self.spawn_i = 0
+        if i not in self.dirty:
+            self.dirty[i] = (self.x[i], self.y[i])
+        k = self.spawn_i
+        self.spawn_i = k + 1
+        self.x[i] = self.spawn_x[k]
+        self.y[i] = self.spawn_y[k]
+        self.color[i] = random.randrange(len(self.colors))
+        self.version[i] = self.next_version
+        self.next_version += 1
+
+    def take_dirty(self):
+        """Слоты, сдвинутые с прошлого вызова: {слот: (старый x, старый y)}"""
+        dirty, self.dirty = self.dirty, {}
+        return dirty
+
+# ---------- ДВИЖЕНИЕ ----------
+def sanitize_targets(plist):
+    """Нечисловые цели мыши (nan, inf) заменяются позицией игрока — он стоит.
+    Вызывается до интегратора, чтобы оба бэкенда видели одни и те же цели"""
+    for p in plist:
+        if not (isfinite(p.tx) and isfinite(p.ty)):
+            p.tx, p.ty = p.x, p.y
+
+def integrate_python(plist, dt, now, touched):
+    """Движение, буст, реген и граница арены — поштучно для каждого игрока"""
+    touched.clear()
+    # 0.88 за шаг при TUNED_RATE: за секунду скорость гаснет одинаково при любой частоте
+    damp = 0.88 ** (dt * TUNED_RATE)
+    for p in plist:
+        dx,dy=p.tx-p.x,p.ty-p.y
+        target_angle=atan2(dy,dx)
+        diff=(target_angle-p.angle+3.14159)%(2*3.14159)-3.14159
+        p.angle+=max(-ROT_SPEED*dt,min(ROT_SPEED*dt,diff))
+        dist=sqrt(dx*dx+dy*dy)
+        base_speed = PLAYER_SPEED * p.speed_mult
+        if p.boost:
+            base_speed = max(PLAYER_SPEED * p.speed_mult,
+                             220 * BOOST_MULT * p.boost_mult)
+
+        if dist>1:
+            p.x+=cos(p.angle)*base_speed*dt
+            p.y+=sin(p.angle)*base_speed*dt
+        p.x+=p.vx*dt; p.y+=p.vy*dt
+        p.vx*=damp; p.vy*=damp
+        # --- урон от ускорения ---
+        if p.boost:
+            p.hp = max(0, p.hp - p.max_hp * 0.15 * dt)
+            p.last_hit_time = now  # останавливаем реген пока бустит
+
+        # --- реген ---
+        if p.hp > 0 and p.hp < p.max_hp:
+            last_hit = p.last_hit_time
+            if now - last_hit > 5.0 and not p.boost:
+                p.hp = min(p.max_hp, p.hp + p.regen * dt)
+
+        cx, cy = WORLD_CENTER
+        dx, dy = p.x - cx, p.y - cy
+        dist = sqrt(dx * dx + dy * dy)
+        if dist > WORLD_RADIUS - PLAYER_RADIUS:
+            nx, ny = dx / dist, dy / dist
+            p.x = cx + nx * (WORLD_RADIUS - PLAYER_RADIUS)
+            p.y = cy + ny * (WORLD_RADIUS - PLAYER_RADIUS)
+
+class NumpyIntegrator:
+    """То же, что integrate_python, но целыми массивами NumPy.
+
+    Столбцы живут между тиками: из объектов каждый тик читаются только цели
+    мыши и буст, а остальные поля — лишь для игроков из touched (их меняли
+    толчки, урон или баффы). Полная выборка — только когда сменился состав игроков.
+    Обратно пишутся позиция и угол, а hp, скорость и last_hit_time — только там,
+    где они поменялись.
+    """
+    FIELDS = ("x", "y", "tx", "ty", "angle", "vx", "vy", "hp", "max_hp", "regen",
+              "last_hit_time", "speed_mult", "boost_mult", "boost")
+
+    def __init__(self):
+        self.plist = []
+        self.rows = {}
+        self.cols = None
+        self.row_of = attrgetter(*self.FIELDS)
+
+    def load(self, plist):
+        self.plist = list(plist)
+        self.rows = {p: i for i, p in enumerate(self.plist)}
+        self.cols = np.array([self.row_of(p) for p in self.plist], dtype=float).reshape(-1, len(self.FIELDS)).T.copy()
+
+    def __call__(self, plist, dt, now, touched):
+        if plist != self.plist:
+            self.load(plist)
+        else:
+            cols = self.cols
+            n = len(plist)
+            cols[2] = np.fromiter(map(attrgetter("tx"), plist), float, n)
+            cols[3] = np.fromiter(map(attrgetter("ty"), plist), float, n)
+            cols[13] = np.fromiter(map(attrgetter("boost"), plist), float, n)
+            fresh = [p for p in touched if p in self.rows]
+            if fresh:
+                idx = [self.rows[p] for p in fresh]
+                cols[:, idx] = np.array([self.row_of(p) for p in fresh], dtype=float).T
+        touched.clear()
+        if not plist:
+            return
+        x, y, tx, ty, angle, vx, vy, hp, max_hp, regen, last_hit, speed_mult, boost_mult, boost = self.cols
+        boost = boost != 0
+        hp_before = hp.copy()
+
+        dx, dy = tx - x, ty - y
+        diff = np.mod(np.arctan2(dy, dx) - angle + 3.14159, 2 * 3.14159) - 3.14159
+        angle += np.clip(diff, -ROT_SPEED * dt, ROT_SPEED * dt)
+        base_speed = PLAYER_SPEED * speed_mult
+        base_speed = np.where(boost, np.maximum(base_speed, 220 * BOOST_MULT * boost_mult), base_speed)
+        moving = np.sqrt(dx * dx + dy * dy) > 1
+        x += np.where(moving, np.cos(angle) * base_speed * dt, 0.0)
+        y += np.where(moving, np.sin(angle) * base_speed * dt, 0.0)
+        x += vx * dt; y += vy * dt
+        damp = 0.88 ** (dt * TUNED_RATE)
+        vx *= damp; vy *= damp
+
+        hp[:] = np.where(boost, np.maximum(0, hp - max_hp * 0.15 * dt), hp)
+        last_hit[boost] = now
+        healing = (hp > 0) & (hp < max_hp) & (now - last_hit > 5.0) & ~boost
+        hp[:] = np.where(healing, np.minimum(max_hp, hp + regen * dt), hp)
+
+        cx, cy = WORLD_CENTER
+        rx, ry = x - cx, y - cy
+        dist = np.sqrt(rx * rx + ry * ry)
+        outside = dist > WORLD_RADIUS - PLAYER_RADIUS
+        if outside.any():
+            x[outside] = cx + rx[outside] / dist[outside] * (WORLD_RADIUS - PLAYER_RADIUS)
+            y[outside] = cy + ry[outside] / dist[outside] * (WORLD_RADIUS - PLAYER_RADIUS)
+
+        for p, px, py, pa in zip(plist, x.tolist(), y.tolist(), angle.tolist()):
+            p.x = px; p.y = py; p.angle = pa
+        idx = np.flatnonzero(hp != hp_before)
+        for i, v in zip(idx.tolist(), hp[idx].tolist()):
+            plist[i].hp = v
+        idx = np.flatnonzero((vx != 0) | (vy != 0))
+        for i, a, b in zip(idx.tolist(), vx[idx].tolist(), vy[idx].tolist()):
+            plist[i].vx = a; plist[i].vy = b
+        for i in np.flatnonzero(boost).tolist():
+            plist[i].last_hit_time = now
+
+
+
+if PHYSICS_BACKEND == "numpy" and np is None:
+    print("⚠️ PHYSICS_BACKEND=numpy, но NumPy не установлен — считаем по-старому.")
+USE_NUMPY = PHYSICS_BACKEND == "numpy" and np is not None
+
+# ---------- ЛИДЕРБОРД ----------
+class Leaderboard:
+    """Топ size игроков по счёту, обновляется по месту при изменении счёта.
+
+    update(p) после каждого изменения p.score стоит O(size); полный проход по
+    игрокам — только когда из мира уходит игрок из топа (refill).
+    """
+
+    def __init__(self, players, size=10):
+        self.players = players  # sid -> Player, тот же dict, что в World
+        self.size = size
+        self.top = []  # Player по убыванию счёта
+        self.rev = 0   # растёт при каждом изменении топа
+
+    def update(self, p):
+        top = self.top
+        if p not in top:
+            if len(top) >= self.size and p.score <= top[-1].score:
+                return
+            top.append(p)
+        top.sort(key=attrgetter("score"), reverse=True)
+        del top[self.size:]
+        self.rev += 1
+
+    def remove(self, p):
+        if p in self.top:
+            self.refill()
+
+    def refill(self):
+        self.top = heapq.nlargest(self.size, self.players.values(), key=attrgetter("score"))
+        self.rev += 1
+
+# ---------- МИР ----------
+class World:
+    """Игроки, пеллеты и правила одной арены. Про сеть ничего не знает:
+    всё, что надо сообщить клиентам, копится в events и возвращается из step()"""
+
+    def __init__(self, pellet_count=PELLET_COUNT):
+        self.players = {}  # sid -> Player
+        self.leaderboard = Leaderboard(self.players)
+        self.pellets = PelletPool(pellet_count)
+        # индекс пеллетов: ячейка ~ радиус подбора, так что хватает 3×3 соседних ячеек
+        self.pellet_grid = SpatialGrid(PLAYER_RADIUS + PELLET_RADIUS)
+        for i in range(pellet_count):
+            self.pellet_grid.insert(i, self.pellets.x[i], self.pellets.y[i])
+        self.touched = set()  # игроки, чьи поля движения менялись вне шага (толчки, урон, баффы)
+        self.integrate = NumpyIntegrator() if USE_NUMPY else integrate_python
+        self.events = []
+        self.phases = (0.0,) * len(STEP_PHASES)  # длительности фаз последнего шага, с
+        self.last_pid = 0
+
+    # --- игроки ---
+    def free_pid(self):
+        """Следующий числовой id игрока — короче sid в каждом кадре.
+
+        Id погибшего сразу не переиспользуется: в подтверждённом снимке клиента
+        под ним мог остаться прежний игрок с той же ревизией статики, и новому
+        не ушли бы имя, цвет и шип. Счётчик идёт по кругу до MAX_PID, живые
+        id пропускаются.
+        """
+        used = {p.pid for p in self.players.values()}
+        pid = self.last_pid
+        while True:
+            pid = pid % MAX_PID + 1
+            if pid not in used:
+                break
+        self.last_pid = pid
+        return pid
+
+    def add_player(self, sid, name, color, spike):
+        x=random.randint(PLAYER_RADIUS,WORLD_W-PLAYER_RADIUS)
+        y=random.randint(PLAYER_RADIUS,WORLD_H-PLAYER_RADIUS)
+        if sid in self.players:  # повторный спавн того же sid — старый игрок уходит
+            self.remove_player(sid)
+        p = self.players[sid] = Player(sid, self.free_pid(), name, color, spike, x, y)
+        self.leaderboard.update(p)
+        return p
+
+    def remove_player(self, sid):
+        p = self.players.pop(sid, None)
+        if p is not None:
+            self.drop_cooldowns(p)
+            self.leaderboard.remove(p)
+        return p
+
+    def kill_player(self, sid):
+        """Убирает погибшего игрока из мира"""
+        p = self.remove_player(sid)
+        if p is not None:
+            self.events.append(("dead", sid, int(p.score)))
+
+    # --- пеллеты ---
+    def replace_pellet(self, idx):
+        """Перерождает съеденный пеллет в другом месте и обновляет сетку"""
+        pool = self.pellets
+        self.pellet_grid.remove(idx, pool.x[idx], pool.y[idx])
+        pool.respawn(idx)
+        self.pellet_grid.insert(idx, pool.x[idx], pool.y[idx])
+
+    def apply_pellet_effect(self, p, idx):
+        p.score += 1
+        self.leaderboard.update(p)
+        # каждые 50 очков открываем выбор баффа
+        if p.score % 50 == 0:
+            self.give_buff_options(p.sid)
+
+    # --- баффы ---
+    def give_buff_options(self, sid):
+        """Предлагает игроку 3 случайных баффа для выбора"""
+        buffs = random.sample(BUFF_POOL, 3)
+        self.players[sid].buff_choices = buffs
+        self.events.append(("buff_choices", sid, buffs))
+
+    def choose_buff(self, sid, idx):
+        p = self.players[sid]
+        buffs = p.buff_choices
+        if not buffs or not (0 <= idx < len(buffs)):
+            return
+        buff = buffs[idx]
+        k, v, t = buff["key"], buff["value"], buff["type"]
+        # применяем бафф
+        if t == "add":
+            setattr(p, k, getattr(p, k) + v)
+        elif t == "mult":
+            # для полей с множителями (speed_mult, boost_mult, spike_size, spike_length)
+            setattr(p, k, getattr(p, k) * v)
+        p.buff_choices = None
+        self.touched.add(p)
+        p.rev += 1  # статичные поля изменились — клиенты получат их заново
+
+    # --- PvP ---
+    def set_cooldown(self, a, b, now):
+        """Пара a–b не наносит друг другу урон DAMAGE_COOLDOWN секунд.
+
+        Слот пишется обоим игрокам, просроченные слоты выкидываются при записи —
+        у игрока в словаре только живые соперники, с которыми он недавно дрался.
+        """
+        until = now + DAMAGE_COOLDOWN
+        for p, other in ((a, b), (b, a)):
+            cd = p.cooldowns
+            if cd:
+                for sid in [sid for sid, t in cd.items() if t < now]:
+                    del cd[sid]
+            cd[other.sid] = until
+
+    def drop_cooldowns(self, p):
+        """Снимает кулдауны ушедшего игрока у тех, с кем он дрался"""
+        for sid in p.cooldowns:
+            other = self.players.get(sid)
+            if other is not None:
+                other.cooldowns.pop(p.sid, None)
+        p.cooldowns.clear()
+
+    def pvp_pairs(self, sids):
+        """Широкая фаза: пары игроков (i<j), которые могут толкнуться или достать шипом.
+
+        Ячейка сетки не меньше максимальной дальности взаимодействия,
+        поэтому все кандидаты лежат в 3×3 соседних ячейках.
+        """
+        players = self.players
+        reach = PLAYER_RADIUS * 2
+        for sid in sids:
+            reach = max(reach, spike_reach(players[sid]) + PLAYER_RADIUS)
+        grid = SpatialGrid(reach)
+        for i, sid in enumerate(sids):
+            p = players[sid]
+            grid.insert(i, p.x, p.y)
+        pairs = []
+        for i, sid in enumerate(sids):
+            p = players[sid]
+            for j in grid.near(p.x, p.y):
+                if j > i:
+                    pairs.append((i, j))
+        pairs.sort()  # тот же порядок обхода, что и у полного перебора
+        return pairs
+
+    def handle_pvp(self, dt, now):
+        players, touched = self.players, self.touched
+        sids=list(players.keys())
+        # кончики шипов — один раз на игрока за тик
+        tips=[]
+        for sid in sids:
+            p=players[sid]; r=spike_reach(p)
+            tips.append((p.x+cos(p.angle)*r, p.y+sin(p.angle)*r))
+        for i,j in self.pvp_pairs(sids):
+            sid_a,sid_b=sids[i],sids[j]
+            a,b=players[sid_a],players[sid_b]
+
+            dx=b.x-a.x; dy=b.y-a.y; dist=sqrt(dx*dx+dy*dy)
+            if dist==0: continue
+
+            overlap=PLAYER_RADIUS*2-dist
+            if overlap>0:
+                nx,ny=dx/dist,dy/dist
+                impulse=overlap*5.0*dt*TUNED_RATE  # сила, а не рывок за шаг
+                a.vx-=nx*impulse
+                a.vy-=ny*impulse
+                b.vx+=nx*impulse
+                b.vy+=ny*impulse
+                touched.add(a); touched.add(b)
+
+            tip_ax,tip_ay=tips[i]
+            tip_bx,tip_by=tips[j]
+
+            if distance(tip_ax,tip_ay,b.x,b.y)<PLAYER_RADIUS and distance(tip_bx,tip_by,a.x,a.y)>PLAYER_RADIUS:
+                if now>a.cooldowns.get(sid_b,0):
+                    b.hp=max(0,b.hp-a.damage); self.set_cooldown(a,b,now)
+                    touched.add(b)
+                    self.events.append(("spark", b.x, b.y))
+                    b.last_hit_time = now
+                    # если игрок B умер — начисляем убийце +30 очков
+                    if b.hp <= 0:
+                        old_score = a.score
+                        a.score += 30
+                        self.leaderboard.update(a)
+                        # Проверяем, пересёк ли игрок ближайший порог 50
+                        if (old_score // 50) < (a.score // 50):
+                            self.give_buff_options(sid_a)
+                        self.events.append(("kill_bonus", a.x, a.y, 30))
+            elif distance(tip_bx,tip_by,a.x,a.y)<PLAYER_RADIUS and distance(tip_ax,tip_ay,b.x,b.y)>PLAYER_RADIUS:
+                if now>a.cooldowns.get(sid_b,0):
+                    a.hp=max(0,a.hp-b.damage); self.set_cooldown(a,b,now)
+                    touched.add(a)
+                    self.events.append(("spark", a.x, a.y))
+                    a.last_hit_time = now
+                    # если игрок A умер — начисляем убийце +30 очков
+                    if a.hp <= 0:
+                        old_score = b.score
+                        b.score += 30
+                        self.leaderboard.update(b)
+                        if (old_score // 50) < (b.score // 50):
+                            self.give_buff_options(sid_b)
+                        self.events.append(("kill_bonus", b.x, b.y, 30))
+
+    # --- шаг ---
+    def step(self, dt, now):
+        """Один шаг симуляции длиной dt; now — время симуляции. Возвращает события шага"""
+        players = self.players
+        t0 = perf_counter()
+        plist = list(players.values())
+        sanitize_targets(plist)
+        self.integrate(plist, dt, now, self.touched)
+        t1 = perf_counter()
+        self.handle_pvp(dt, now)
+        t2 = perf_counter()
+        # погибшие (от буста или в PvP) убираются сразу, клиенту уйдёт событие dead
+        for sid,p in list(players.items()):
+            if p.hp<=0: self.kill_player(sid)
+        t3 = perf_counter()
+        self.pickup_pellets()
+        self.phases = (t1 - t0, t2 - t1, t3 - t2, perf_counter() - t3)
+        events, self.events = self.events, []
+        return events
+
+    def pickup_pellets(self):
+        """Игроки съедают пеллеты в радиусе подбора; съеденный сразу
+        перерождается в другом месте, так что второй раз его не съесть"""
+        xs, ys = self.pellets.x, self.pellets.y
+        reach = (PLAYER_RADIUS + PELLET_RADIUS) ** 2
+        for p in self.players.values():
+            px, py = p.x, p.y
+            eaten = [i for i in self.pellet_grid.near(px, py) if (xs[i]-px)**2 + (ys[i]-py)**2 <= reach]
+            for i in eaten:
+                self.apply_pellet_effect(p, i)
+                self.replace_pellet(i)
+
+
+# ---------- БОТЫ БЕЗ СЕРВЕРА ----------
+class Bot:
+    """Скриптовый игрок: бродит по арене, гонится за ближайшим соседом,
+    иногда бустит и сразу берёт случайный бафф"""
+
+    def __init__(self, world, sid, rng):
+        self.world, self.sid, self.rng = world, sid, rng
+        self.spawn()
+
+    def spawn(self):
+        self.world.add_player(self.sid, self.sid, "#8ac926", "classic")
+
+    def think(self, grid):
+        p = self.world.players.get(self.sid)
+        if p is None:
+            return
+        rng = self.rng
+        near = [q for q in grid.near(p.x, p.y) if q is not p]
+        if near:
+            q = min(near, key=lambda q: (q.x - p.x) ** 2 + (q.y - p.y) ** 2)
+            p.tx, p.ty = q.x, q.y
+        else:
+            a, r = rng.uniform(0, tau), WORLD_RADIUS * sqrt(rng.random())
+            p.tx, p.ty = WORLD_CENTER[0] + cos(a) * r, WORLD_CENTER[1] + sin(a) * r
+        p.boost = bool(near) and p.hp > p.max_hp / 2 and rng.random() < 0.3
+        if p.buff_choices:
+            self.world.choose_buff(self.sid, rng.randrange(len(p.buff_choices)))
+
+
+def run_headless(bots, ticks, rate=PHYSICS_RATE, think_every=15, seed=None):
+    """Гоняет мир с ботами так быстро, как позволяет CPU; возвращает сводку"""
+    rng = random.Random(seed)
+    if seed is not None:
+        random.seed(seed)
+    world = World()
+    crowd = {f"bot{i}": Bot(world, f"bot{i}", rng) for i in range(bots)}
+    dt, now = 1.0 / rate, 0.0
+    counts = {}
+    started = time.perf_counter()
+    for tick in range(ticks):
+        if tick % think_every == 0:
+            grid = SpatialGrid(800)  # «зрение» ботов
+            for p in world.players.values():
+                grid.insert(p, p.x, p.y)
+            for bot in crowd.values():
+                bot.think(grid)
+        now += dt
+        for event in world.step(dt, now):
+            counts[event[0]] = counts.get(event[0], 0) + 1
+            if event[0] == "dead":
+                crowd[event[1]].spawn()  # численность ботов постоянная
+    wall = time.perf_counter() - started
+    return {"bots": bots, "ticks": ticks, "sim_seconds": ticks * dt, "wall_seconds": wall,
+            "ticks_per_second": ticks / wall if wall else float("inf"),
+            "speedup": ticks * dt / wall if wall else float("inf"), "events": counts}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Симуляция арены без сервера")
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=PHYSICS_RATE * 60)
+    parser.add_argument("--rate", type=int, default=PHYSICS_RATE)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    r = run_headless(args.bots, args.ticks, args.rate, seed=args.seed)
+    print(f"{r['bots']} bots, {r['ticks']} ticks ({r['sim_seconds']:.0f} s of game) "
+          f"in {r['wall_seconds']:.2f} s: {r['ticks_per_second']:.0f} ticks/s, x{r['speedup']:.1f} real time")
+    print("events:", ", ".join(f"{k}={v}" for k, v in sorted(r["events"].items())) or "none")
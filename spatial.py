@@ -0,0 +1,56 @@
+"""Равномерная сетка (spatial hash) для поиска соседей на арене."""
+
+
+class SpatialGrid:
+    """Разреженная сетка: (cx, cy) -> множество id объектов в этой ячейке.
+
+    Хранятся только непустые ячейки, так что размер арены на память не влияет.
+    """
+
+    __slots__ = ("cell", "cells")
+
+    def __init__(self, cell_size):
+        self.cell = float(cell_size)
+        self.cells = {}
+
+    def key(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def insert(self, oid, x, y):
+        k = self.key(x, y)
+        bucket = self.cells.get(k)
+        if bucket is None:
+            self.cells[k] = {oid}
+        else:
+            bucket.add(oid)
+
+    def remove(self, oid, x, y):
+        k = self.key(x, y)
+        bucket = self.cells.get(k)
+        if bucket is not None:
+            bucket.discard(oid)
+            if not bucket:
+                del self.cells[k]
+
+    def clear(self):
+        self.cells.clear()
+
+    def near(self, x, y):
+        """id из ячейки точки и 8 соседних — всё, что ближе cell_size."""
+        cx, cy = self.key(x, y)
+        cells = self.cells
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                bucket = cells.get((i, j))
+                if bucket:
+                    yield from bucket
+
+    def rect(self, x0, y0, x1, y1):
+        """id из всех ячеек, пересекающих прямоугольник; точную проверку делает вызывающий."""
+        c = self.cell
+        cells = self.cells
+        for i in range(int(x0 // c), int(x1 // c) + 1):
+            for j in range(int(y0 // c), int(y1 // c) + 1):
+                bucket = cells.get((i, j))
+                if bucket:
+                    yield from bucket
@@ -0,0 +1,619 @@
+const STATE_FMT=new URLSearchParams(location.search).get('proto');  // ?proto=bin|json
+const canvas=document.getElementById('game'),ctx=canvas.getContext('2d');
+const hud=document.getElementById('hud'),menu=document.getElementById('menu'),death=document.getElementById('death');
+const hpText=document.getElementById('hpText'),damageText=document.getElementById('damageText'),hpFill=document.getElementById('healthfill');
+const nameInput=document.getElementById('nameInput'),playBtn=document.getElementById('playBtn'),restartBtn=document.getElementById('restartBtn');
+const colorSelect=document.getElementById('colorSelect'),
+      spikeSelect=document.getElementById('spikeSelect');
+const previewCanvas=document.getElementById('previewCanvas'),
+      pctx=previewCanvas.getContext('2d');
+let previewColor=colorSelect.value, previewSpike=spikeSelect.value, previewAngle=0;
+
+
+
+function resize(){canvas.width=window.innerWidth;canvas.height=window.innerHeight;}window.addEventListener('resize',resize);resize();
+
+const socket=io({transports:TRANSPORTS});
+let me=null,players={},pellets=[],mouse={x:0,y:0},boosting=false;
+let myPid=null,snaps={},lastSeq=0;  // дельта-протокол: снимки по номерам
+let pos=null;  // своя позиция по предсказанию (камера и отрисовка себя)
+let sparks=[],trail=[];
+let overview={lb:[],map:[]};
+
+function viewSize(){return {w:canvas.width,h:canvas.height};}
+function viewState(){return Object.assign(viewSize(),{hidden:document.hidden});}
+window.addEventListener('resize',()=>{if(me)socket.emit('view',viewState());});
+document.addEventListener('visibilitychange',()=>{if(me)socket.emit('view',viewState());});
+
+canvas.addEventListener('mousemove',e=>{mouse.x=e.clientX;mouse.y=e.clientY;});
+canvas.addEventListener('mousedown',()=>{boosting=true;socket.emit('boost',{state:true});});
+canvas.addEventListener('mouseup',()=>{boosting=false;socket.emit('boost',{state:false});});
+
+// обновление превью при выборе цвета или шипа
+function updatePreview(){
+  previewColor=colorSelect.value;
+  previewSpike=spikeSelect.value;
+}
+colorSelect.addEventListener('change', updatePreview);
+spikeSelect.addEventListener('change', updatePreview);
+
+// цикл отрисовки превью
+function drawPreview() {
+  const dpr = window.devicePixelRatio || 1;
+  const w = 160, h = 160;
+  previewCanvas.width = w * dpr;
+  previewCanvas.height = h * dpr;
+  previewCanvas.style.width = w + 'px';
+  previewCanvas.style.height = h + 'px';
+  pctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+
+  const cx = w / 2, cy = h / 2;
+  pctx.clearRect(0, 0, w, h);
+
+  // фон
+  const g = pctx.createRadialGradient(cx, cy, 20, cx, cy, 80);
+  g.addColorStop(0, '#181a2f');
+  g.addColorStop(1, '#0f1220');
+  pctx.fillStyle = g;
+  pctx.fillRect(0, 0, w, h);
+
+  // тело персонажа
+  pctx.beginPath();
+  pctx.fillStyle = previewColor;
+  pctx.shadowBlur = 12;
+  pctx.shadowColor = previewColor;
+  pctx.arc(cx, cy, PLAYER_RADIUS, 0, Math.PI * 2);
+  pctx.fill();
+  pctx.shadowBlur = 0;
+
+  // отрисовка шипа
+  try {
+    drawSpikeCtx(pctx, { spike: previewSpike, angle: previewAngle }, cx, cy);
+  } catch(e) {
+    console.error("Ошибка в drawSpike preview:", e);
+  }
+
+
+  previewAngle += 0.02;
+  requestAnimationFrame(drawPreview);
+}
+drawPreview();
+
+
+
+playBtn.onclick=()=>{
+  const n=(nameInput.value||"Player").slice(0,16);
+  const color=colorSelect.value;
+  const spike=spikeSelect.value;
+  socket.emit('spawn',{name:n,color:color,spike:spike,view:viewSize(),fmt:STATE_FMT}); // передаем выбранные параметры
+  menu.style.display='none';
+  hud.style.display='block';
+  minimap.style.display = 'block';
+  leaderboard.style.display = 'block';
+};
+restartBtn.onclick = () => {
+  death.style.display = 'none';
+  menu.style.display = 'flex';
+  minimap.style.display = 'none';
+  leaderboard.style.display = 'none';
+};
+
+socket.on('welcome',d=>{me=d.me;myPid=d.me.pid;players={};pellets=[];snaps={};lastSeq=0;resetMotion();updateStats();});
+
+// собираем полный снимок из базового (b) и дельты; b=0 — полный кадр
+function applyState(d){
+  const base=d.b?snaps[d.b]:null;
+  if(d.b&&!base)return false;  // базы уже нет — ждём полный кадр
+  const ps=Object.assign({},base?base.players:{});
+  const fs=Object.assign({},base?base.pellets:{});
+  for(const pid of d.pr||[])delete ps[pid];
+  for(const pid in d.ps||{})ps[pid]=Object.assign({},ps[pid],d.ps[pid]);
+  for(const pid in d.p||{})ps[pid]=Object.assign({},ps[pid],d.p[pid]);
+  for(const idx of d.fr||[])delete fs[idx];
+  for(const idx in d.f||{}){const f=d.f[idx];fs[idx]={x:f[0],y:f[1],color:f[2]};}
+  snaps[d.s]={players:ps,pellets:fs};
+  for(const s in snaps)if(+s<d.b)delete snaps[s];  // старше базы сервер уже не сошлётся
+  lastSeq=d.s;
+  players=ps;pellets=Object.values(fs);
+  return true;
+}
+// бинарный кадр (см. protocol.encode_binary) -> тот же объект, что и JSON-кадр
+const utf8=new TextDecoder();
+function decodeState(buf){
+  const v=new DataView(buf);
+  const d={s:v.getUint32(1,true),b:v.getUint32(5,true),t:v.getUint32(9,true),p:{},pr:[],f:{},fr:[]};
+  const nP=v.getUint16(13,true),nPR=v.getUint16(15,true),nF=v.getUint16(17,true),nFR=v.getUint16(19,true),
+        nFX=v.getUint16(21,true),nS=v.getUint32(23,true);
+  let o=27;
+  for(let i=0;i<nP;i++,o+=14)d.p[v.getUint16(o,true)]={
+    x:v.getUint16(o+2,true)/POS_SCALE,y:v.getUint16(o+4,true)/POS_SCALE,
+    angle:v.getUint16(o+6,true)/ANGLE_SCALE,hp:v.getUint16(o+8,true)/HP_SCALE,score:v.getUint32(o+10,true)};
+  for(let i=0;i<nPR;i++,o+=2)d.pr.push(v.getUint16(o,true));
+  for(let i=0;i<nF;i++,o+=7)d.f[v.getUint16(o,true)]=[v.getUint16(o+2,true)/POS_SCALE,v.getUint16(o+4,true)/POS_SCALE,PELLET_COLORS[v.getUint8(o+6)]];
+  for(let i=0;i<nFR;i++,o+=2)d.fr.push(v.getUint16(o,true));
+  if(nFX)d.fx=[];
+  for(let i=0;i<nFX;i++,o+=7)d.fx.push([v.getUint8(o),v.getUint16(o+1,true)/POS_SCALE,v.getUint16(o+3,true)/POS_SCALE,v.getUint16(o+5,true)]);
+  if(nS)d.ps=JSON.parse(utf8.decode(new Uint8Array(buf,o,nS)));
+  return d;
+}
+socket.on('state',d=>{
+  if(d instanceof ArrayBuffer)d=decodeState(d);
+  if(applyState(d)){
+    pushSnapshot(d.t);
+    if(players[myPid]){me=players[myPid];reconcile();updateStats();}
+  }
+  for(const [kind,x,y,value] of d.fx||[]){
+    if(kind===FX_SPARK)addSpark(x,y);
+    else if(kind===FX_KILL_BONUS)addKillBonus(x,y,value);
+  }
+});
+socket.on('dead', data => {
+  const score = data && typeof data.score !== 'undefined' ? data.score : (me ? me.score : 0);
+  me = null;
+  players = {};
+  pellets = [];
+  snaps = {};
+  resetMotion();
+  hud.style.display = 'none';
+  death.style.display = 'flex';
+  menu.style.display = 'none';
+  minimap.style.display = 'none';
+  leaderboard.style.display = 'none';
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+  const scoreEl = document.getElementById('finalScore');
+  if (scoreEl) {
+    scoreEl.textContent = `⭐ Ваш счёт: ${score}`;
+  }
+});
+
+socket.on('overview',d=>{overview=d;updateLeaderboard();renderMinimap();});
+
+// --- интерполяция и предсказание ---
+// state приходит реже, чем кадры экрана (SNAPSHOT_RATE). Чужих игроков рисуем
+// на два интервала между снимками (+ джиттер) в прошлом, между двумя снимками
+// вокруг этого момента по серверной метке t. Интервал меряем: свёрнутым вкладкам
+// и простаивающим клиентам сервер шлёт state реже SNAPSHOT_RATE.
+// Себя рисуем сразу, по своему же вводу и правилам движения sim.py. Сервер видит
+// наш ввод с опозданием в RTT, поэтому его позицию сравниваем с предсказанной
+// RTT назад и расхождение убираем плавно.
+let snapGap=1000/SNAPSHOT_RATE;            // мс: сглаженный интервал между снимками
+const CORRECTION=8;                        // 1/с: скорость подтяжки предсказания к серверу
+const SNAP_DIST=150;                       // дальше — не подтягиваем, а переставляем
+let timeline=[],serverT=null,clockOffset=null,predHist=[],corr={x:0,y:0},rtt=100;
+
+function resetMotion(){snapGap=1000/SNAPSHOT_RATE;timeline=[];serverT=null;clockOffset=null;predHist=[];corr={x:0,y:0};pos=null;}
+
+// t в бинарных кадрах — по модулю 2^32: разворачиваем в непрерывную шкалу
+function unwrapT(t){
+  if(serverT===null)return serverT=t;
+  const d=((t-serverT)%4294967296+6442450944)%4294967296-2147483648;
+  return serverT+=d;
+}
+function pushSnapshot(t){
+  const st=unwrapT(t),o=st-performance.now();
+  // смещение часов — по самому быстрому кадру, медленно отпускаем вниз (дрейф)
+  clockOffset=clockOffset===null||o>clockOffset?o:clockOffset+(o-clockOffset)*0.01;
+  const last=timeline[timeline.length-1];
+  if(last)snapGap+=(Math.min(1000,st-last.t)-snapGap)*0.1;
+  timeline.push({t:st,players:players});
+  while(timeline.length>2&&timeline[1].t<st-1000)timeline.shift();
+}
+function wrapAngle(a){return ((a+Math.PI)%(2*Math.PI)+2*Math.PI)%(2*Math.PI)-Math.PI;}
+// игроки на момент отрисовки: интерполяция между соседними снимками
+function interpolated(){
+  if(timeline.length<2)return players;
+  const rt=performance.now()+clockOffset-(2*snapGap+20);
+  let a=timeline.length-1;
+  while(a>0&&timeline[a].t>rt)a--;
+  if(a===timeline.length-1||timeline[a].t>rt)return timeline[a].players;
+  const A=timeline[a],B=timeline[a+1],k=(rt-A.t)/(B.t-A.t),out={};
+  for(const pid in B.players){
+    const p=B.players[pid],q=A.players[pid];
+    out[pid]=q?Object.assign({},p,{x:q.x+(p.x-q.x)*k,y:q.y+(p.y-q.y)*k,angle:q.angle+wrapAngle(p.angle-q.angle)*k}):p;
+  }
+  return out;
+}
+// своё движение — те же правила, что integrate_python (без толчков: их принесёт сервер)
+function predict(dt){
+  if(!me)return;
+  if(!pos)pos={x:me.x,y:me.y,angle:me.angle};
+  const dx=mouse.x-canvas.width/2,dy=mouse.y-canvas.height/2;
+  const turn=ROT_SPEED*dt;
+  pos.angle+=Math.max(-turn,Math.min(turn,wrapAngle(Math.atan2(dy,dx)-pos.angle)));
+  let speed=PLAYER_SPEED*(me.speed_mult||1);
+  if(boosting)speed=Math.max(speed,PLAYER_SPEED*BOOST_MULT*(me.boost_mult||1));
+  if(Math.hypot(dx,dy)>1){pos.x+=Math.cos(pos.angle)*speed*dt;pos.y+=Math.sin(pos.angle)*speed*dt;}
+  // подтяжка к серверу; история сдвигается вместе с позицией, чтобы не поправить дважды
+  const k=Math.min(1,dt*CORRECTION),cx=corr.x*k,cy=corr.y*k;
+  pos.x+=cx;pos.y+=cy;corr.x-=cx;corr.y-=cy;
+  for(const h of predHist){h[1]+=cx;h[2]+=cy;}
+  const rx=pos.x-WORLD_W/2,ry=pos.y-WORLD_H/2,r=Math.hypot(rx,ry),lim=WORLD_RADIUS-PLAYER_RADIUS;
+  if(r>lim){pos.x=WORLD_W/2+rx/r*lim;pos.y=WORLD_H/2+ry/r*lim;}
+  const now=performance.now();
+  predHist.push([now,pos.x,pos.y]);
+  while(predHist.length&&predHist[0][0]<now-1000)predHist.shift();
+}
+// сервер прислал себя: сравниваем с тем, где мы себя рисовали RTT назад
+function reconcile(){
+  if(!pos)return;
+  const st=performance.now()-rtt;
+  let i=0;
+  while(i<predHist.length&&predHist[i][0]<=st)i++;
+  let hx=pos.x,hy=pos.y;  // истории ещё нет — сравниваем с текущей позицией
+  if(i>0&&i<predHist.length){
+    const a=predHist[i-1],b=predHist[i],k=(st-a[0])/(b[0]-a[0]);
+    hx=a[1]+(b[1]-a[1])*k;hy=a[2]+(b[2]-a[2])*k;
+  }
+  const ex=me.x-hx,ey=me.y-hy;
+  if(Math.hypot(ex,ey)>SNAP_DIST){pos.x=me.x;pos.y=me.y;pos.angle=me.angle;predHist=[];corr={x:0,y:0};return;}
+  corr={x:ex,y:ey};
+}
+
+// эффекты приходят в поле fx кадра state
+function addSpark(x, y) {
+  sparks.push({x:x,y:y,life:0.4,particles:Array.from({length:12},()=>({
+    vx:(Math.random()-0.5)*320, vy:(Math.random()-0.5)*320, r:Math.random()*2+1
+  }))});
+}
+
+let floatTexts = [];
+
+function addKillBonus(x, y, value) {
+  floatTexts.push({
+    x: x,
+    y: y,
+    value: value,
+    life: 1.0 // секунда жизни
+  });
+}
+
+function updateStats() {
+  if (!me) return;
+  hpText.textContent = Math.round(me.hp) + " / " + Math.round(me.max_hp);
+  damageText.textContent = me.damage;
+  const scoreEl = document.getElementById('scoreText');
+  if (scoreEl) scoreEl.textContent = me.score || 0;
+  hpFill.style.width = (Math.max(0, me.hp / me.max_hp) * 100) + '%';
+}
+
+// RTT — по подтверждению Socket.IO на пустое событие rtt
+setInterval(()=>{if(!me)return;const sent=performance.now();socket.emit('rtt',()=>{rtt+=(performance.now()-sent-rtt)*0.25;});},2000);
+setInterval(()=>{if(!me||!pos)return;const wx=pos.x+(mouse.x-canvas.width/2),wy=pos.y+(mouse.y-canvas.height/2);socket.emit('input',{targetX:wx,targetY:wy,ack:lastSeq});},1000/INPUT_RATE);
+
+// --- отрисовка шипов в любой контекст ---
+function drawSpikeCtx(gctx, pl, sx, sy) {
+  const sizeMul = pl.spike_size || 1.0;
+  const lenMul = pl.spike_length || 1.0;
+  const spike = pl.spike || "classic";
+  const angle = pl.angle;
+  gctx.save();
+
+  if (spike === 'classic') {
+      gctx.beginPath();
+      const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + SHARP_LEN*lenMul);
+      const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + SHARP_LEN*lenMul);
+      gctx.moveTo(tipX, tipY);
+      gctx.lineTo(sx + Math.cos(angle+2.5)*(PLAYER_RADIUS*sizeMul-4), sy + Math.sin(angle+2.5)*(PLAYER_RADIUS*sizeMul-4));
+      gctx.lineTo(sx + Math.cos(angle-2.5)*(PLAYER_RADIUS*sizeMul-4), sy + Math.sin(angle-2.5)*(PLAYER_RADIUS*sizeMul-4));
+      gctx.closePath();
+      gctx.fillStyle = '#fff';
+      gctx.fill();
+  } 
+  else if (spike === 'unicorn') {
+    const len = SHARP_LEN *lenMul * 2.5;
+    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
+    grad.addColorStop(0, '#ff00ff');
+    grad.addColorStop(0.25, '#00ffff');
+    grad.addColorStop(0.5, '#00ff88');
+    grad.addColorStop(0.75, '#ffff00');
+    grad.addColorStop(1, '#ff00ff');
+    gctx.beginPath();
+    gctx.moveTo(tipX, tipY);
+    gctx.lineTo(sx + Math.cos(angle+2.2)*(PLAYER_RADIUS*sizeMul-5), sy + Math.sin(angle+2.2)*(PLAYER_RADIUS*sizeMul-5));
+    gctx.lineTo(sx + Math.cos(angle-2.2)*(PLAYER_RADIUS*sizeMul-5), sy + Math.sin(angle-2.2)*(PLAYER_RADIUS*sizeMul-5));
+    gctx.closePath();
+    gctx.fillStyle = grad;
+    gctx.shadowBlur = 25;
+    gctx.shadowColor = '#ffffff';
+    gctx.fill();
+    gctx.beginPath();
+    gctx.arc(tipX, tipY, 3, 0, Math.PI*2);
+    gctx.fillStyle = 'rgba(255,255,255,0.9)';
+    gctx.fill();
+  } 
+  else if (spike === 'blade') {
+    const len = SHARP_LEN *lenMul * 1.8;
+    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const side1X = sx + Math.cos(angle+0.5)*(PLAYER_RADIUS*sizeMul-6);
+    const side1Y = sy + Math.sin(angle+0.5)*(PLAYER_RADIUS*sizeMul-6);
+    const side2X = sx + Math.cos(angle-0.5)*(PLAYER_RADIUS*sizeMul-6);
+    const side2Y = sy + Math.sin(angle-0.5)*(PLAYER_RADIUS*sizeMul-6);
+    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
+    grad.addColorStop(0, '#888');
+    grad.addColorStop(0.2, '#cfd8e0');
+    grad.addColorStop(0.5, '#ffffff');
+    grad.addColorStop(0.8, '#9bb2c3');
+    grad.addColorStop(1, '#5a6d7f');
+    gctx.beginPath();
+    gctx.moveTo(tipX, tipY);
+    gctx.lineTo(side1X, side1Y);
+    gctx.lineTo(side2X, side2Y);
+    gctx.closePath();
+    gctx.fillStyle = grad;
+    gctx.shadowBlur = 10;
+    gctx.shadowColor = '#aee6ff';
+    gctx.fill();
+    gctx.beginPath();
+    const midX = (sx + tipX) / 2;
+    const midY = (sy + tipY) / 2;
+    gctx.moveTo(midX, midY);
+    gctx.lineTo(tipX, tipY);
+    gctx.strokeStyle = 'rgba(255,255,255,0.5)';
+    gctx.lineWidth = 1.2;
+    gctx.stroke();
+  } 
+  else if (spike === 'lazer') {
+    const len = SHARP_LEN *lenMul * 2.4;
+    const tipX = sx + Math.cos(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const tipY = sy + Math.sin(angle)*(PLAYER_RADIUS*sizeMul + len*lenMul);
+    const grad = gctx.createLinearGradient(sx, sy, tipX, tipY);
+    grad.addColorStop(0, 'rgba(255,50,50,0.1)');
+    grad.addColorStop(0.5, 'rgba(255,80,80,0.8)');
+    grad.addColorStop(1, 'rgba(255,200,200,1)');
+    gctx.beginPath();
+    gctx.moveTo(sx, sy);
+    gctx.lineTo(tipX, tipY);
+    gctx.strokeStyle = grad;
+    gctx.lineWidth = 3;
+    gctx.shadowBlur = 15;
+    gctx.shadowColor = '#ff3030';
+    gctx.stroke();
+    gctx.beginPath();
+    gctx.arc(tipX, tipY, 3, 0, Math.PI*2);
+    gctx.fillStyle = 'rgba(255,255,255,0.9)';
+    gctx.shadowBlur = 20;
+    gctx.shadowColor = '#ff4040';
+    gctx.fill();
+  }
+
+  gctx.restore();
+}
+
+
+// --- отрисовка шипов (blade = металл, lazer = лазер) ---
+function drawSpike(pl, sx, sy) {
+  // рисуем тем же кодом, но в контекст игрового canvas
+  drawSpikeCtx(ctx, pl, sx, sy);
+}
+
+
+// --- баффы ---
+const buffContainer = document.getElementById('buffContainer');
+let activeBuffs = [];
+
+socket.on('buff_choices', buffs => {
+  buffContainer.innerHTML = '';
+  buffs.forEach((b, i) => {
+    const div = document.createElement('div');
+    div.className = 'buffCard';
+    div.textContent = `${i+1}️⃣ ${b.name}`;
+    buffContainer.appendChild(div);
+  });
+  buffContainer.style.display = 'flex';
+  activeBuffs = buffs;
+});
+
+window.addEventListener('keydown', e => {
+  if (!activeBuffs.length) return;
+  const n = parseInt(e.key);
+  if (n >= 1 && n <= 3) {
+    socket.emit('choose_buff', { index: n - 1 });
+    buffContainer.style.display = 'none';
+    activeBuffs = [];
+  }
+});
+
+function drawBackground(time) {
+  const gradient = ctx.createRadialGradient(canvas.width/2, canvas.height/2, 200, canvas.width/2, canvas.height/2, canvas.width * 1.2);
+  gradient.addColorStop(0, '#15182c');
+  gradient.addColorStop(1, '#0c0f1d');
+  ctx.fillStyle = gradient;
+  ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+  if (!pos) return;
+
+  // --- рисуем красную границу карты ---
+  const camX = pos.x - canvas.width/2;
+  const camY = pos.y - canvas.height/2;
+  const worldCenterX = WORLD_W / 2 - camX;
+  const worldCenterY = WORLD_H / 2 - camY;
+
+  ctx.beginPath();
+  ctx.arc(worldCenterX, worldCenterY, WORLD_RADIUS, 0, Math.PI * 2);
+  ctx.strokeStyle = 'rgba(255,60,60,0.6)';
+  ctx.lineWidth = 6;
+  ctx.shadowBlur = 15;
+  ctx.shadowColor = '#ff3030';
+  ctx.stroke();
+  ctx.shadowBlur = 0;
+}
+
+function drawSparks(dt, camX, camY){ 
+  for(const s of sparks) {
+    s.life-=dt;
+    const t=0.4-s.life;
+    for(const p of s.particles) {
+      const sx=s.x-camX+p.vx*t,sy=s.y-camY+p.vy*t;
+      ctx.beginPath();
+      ctx.fillStyle='rgba(255,220,100,'+Math.max(0,s.life*2).toFixed(3)+')';
+      ctx.shadowBlur=12;ctx.shadowColor='#ffb400';
+      ctx.arc(sx,sy,p.r,0,Math.PI*2);
+      ctx.fill();
+    }
+  }
+  ctx.shadowBlur=0;
+  sparks=sparks.filter(s=>s.life>0);
+}
+
+// --- Миникарта и лидерборд (данные приходят по каналу overview) ---
+const minimap = document.getElementById('minimap');
+const mctx = minimap.getContext('2d');
+const leaderList = document.getElementById('leaderList');
+
+// подложка миникарты (фон и сетка плотности) перерисовывается только с новым overview,
+// в кадре — копия подложки и своя точка
+const minimapBase = document.createElement('canvas'), bctx = minimapBase.getContext('2d');
+
+function renderMinimap() {
+  const w = minimapBase.width = minimap.clientWidth;
+  const h = minimapBase.height = minimap.clientHeight;
+  const scale = (w / 2) / WORLD_RADIUS;
+  const cx = w / 2, cy = h / 2;
+
+  // фон карты
+  bctx.beginPath();
+  bctx.arc(cx, cy, WORLD_RADIUS * scale, 0, Math.PI * 2);
+  bctx.fillStyle = 'rgba(30, 34, 60, 0.8)';
+  bctx.fill();
+  bctx.strokeStyle = 'rgba(255, 60, 60, 0.4)';
+  bctx.lineWidth = 2;
+  bctx.stroke();
+
+  // плотность игроков: пары [ячейка, уровень] из overview
+  bctx.save();
+  bctx.clip();
+  const cw = WORLD_W / MINIMAP_COLS * scale, ch = WORLD_H / MINIMAP_ROWS * scale;
+  const x0 = cx - WORLD_W / 2 * scale, y0 = cy - WORLD_H / 2 * scale;
+  const cells = overview.map;
+  for (let i = 0; i < cells.length; i += 2) {
+    const col = cells[i] % MINIMAP_COLS, row = (cells[i] - col) / MINIMAP_COLS;
+    bctx.fillStyle = `rgba(255,255,255,${(0.15 + 0.6 * cells[i + 1] / MINIMAP_LEVELS).toFixed(2)})`;
+    bctx.fillRect(x0 + col * cw, y0 + row * ch, cw, ch);
+  }
+  bctx.restore();
+}
+
+function drawMinimap() {
+  if (minimap.width !== minimap.clientWidth || minimap.height !== minimap.clientHeight
+      || minimapBase.width !== minimap.clientWidth) {
+    minimap.width = minimap.clientWidth;
+    minimap.height = minimap.clientHeight;
+    renderMinimap();  // окно поменялось или подложку рисовали при скрытой миникарте
+  }
+  const w = minimap.width, h = minimap.height;
+  mctx.clearRect(0, 0, w, h);
+  mctx.drawImage(minimapBase, 0, 0);
+
+  // себя рисуем поверх по точной позиции
+  if (pos) {
+    const scale = (w / 2) / WORLD_RADIUS;
+    mctx.beginPath();
+    mctx.arc(w / 2 + (pos.x - WORLD_W / 2) * scale, h / 2 + (pos.y - WORLD_H / 2) * scale, 3, 0, Math.PI * 2);
+    mctx.fillStyle = '#40c9ff';
+    mctx.shadowBlur = 6;
+    mctx.shadowColor = '#40c9ff';
+    mctx.fill();
+    mctx.shadowBlur = 0;
+  }
+}
+
+let shownLb = '';
+function updateLeaderboard() {
+  const key = JSON.stringify(overview.lb) + myPid;
+  if (key === shownLb) return;  // топ не менялся — DOM не трогаем
+  shownLb = key;
+  leaderList.innerHTML = '';
+  overview.lb.forEach((p, i) => {
+    const li = document.createElement('li');
+    li.textContent = `${i + 1}. ${p.name} — ${p.score}`;
+    if (p.pid === myPid) li.classList.add('me');
+    leaderList.appendChild(li);
+  });
+}
+
+let lastTS=performance.now();
+function draw(){ 
+  const nowTS=performance.now();
+  const dt=Math.min(0.05,(nowTS-lastTS)/1000.0);
+  lastTS=nowTS;
+
+  predict(dt);
+  if(!pos){requestAnimationFrame(draw);return;}
+  const camX=pos.x-canvas.width/2,camY=pos.y-canvas.height/2;
+  const shown=interpolated();
+
+  drawBackground(nowTS*0.0002);
+
+  for(const p of pellets){const sx=p.x-camX,sy=p.y-camY;
+    ctx.beginPath();ctx.fillStyle=p.color;ctx.shadowBlur=12;ctx.shadowColor=p.color;
+    ctx.arc(sx,sy,PELLET_RADIUS,0,Math.PI*2);ctx.fill();ctx.shadowBlur=0;}
+
+  const myTrail={x:pos.x,y:pos.y,time:nowTS};
+  trail.push(myTrail);
+  trail=trail.filter(t=>nowTS-t.time<400);
+  for(const t of trail) {
+    const age=(nowTS-t.time)/400;
+    ctx.beginPath();
+    ctx.fillStyle='rgba(255,255,255,'+(1-age)*0.2+')';
+    ctx.arc(t.x-camX,t.y-camY,PLAYER_RADIUS*(1-age*0.7),0,Math.PI*2);
+    ctx.fill();
+  }
+
+  for(const pid in shown){ 
+      const pl=+pid===myPid?Object.assign({},shown[pid],pos):shown[pid]; 
+      const sx=pl.x-camX, sy=pl.y-camY;
+      ctx.beginPath();
+      ctx.fillStyle=pl.color;
+      ctx.shadowBlur=20;
+      ctx.shadowColor=pl.color;
+      ctx.arc(sx,sy,PLAYER_RADIUS,0,Math.PI*2);
+      ctx.fill();
+      ctx.shadowBlur=0;
+    
+      drawSpike(pl, sx, sy);
+    
+      ctx.fillStyle='rgba(255,255,255,0.9)';
+      ctx.font='15px Inter';
+      ctx.textAlign='center';
+      ctx.fillText(pl.name,sx,sy-PLAYER_RADIUS-12);
+    }
+
+  // --- отрисовка границы карты ---
+  const worldCenterX = WORLD_W/2 - camX;
+  const worldCenterY = WORLD_H/2 - camY;
+  const pulse = Math.sin(performance.now() * 0.003) * 0.15 + 0.85;
+
+  ctx.beginPath();
+  ctx.arc(worldCenterX, worldCenterY, WORLD_RADIUS, 0, Math.PI * 2);
+  ctx.strokeStyle = `rgba(255,80,80,${pulse})`;
+  ctx.lineWidth = 20;
+  ctx.shadowBlur = 40;
+  ctx.shadowColor = '#ff4040';
+  ctx.stroke();
+  ctx.shadowBlur = 0;
+  drawSparks(dt,camX,camY);
+  for (const t of floatTexts) {
+  t.life -= dt;
+  const alpha = Math.max(0, t.life);
+  const sy = t.y - camY - (1.0 - t.life) * 40; // всплывает вверх
+  const sx = t.x - camX;
+  ctx.save();
+  ctx.font = 'bold 26px Inter';
+  ctx.fillStyle = `rgba(255,200,80,${alpha})`;
+  ctx.shadowBlur = 20;
+  ctx.shadowColor = '#ffcc66';
+  ctx.textAlign = 'center';
+  ctx.fillText('+' + t.value, sx, sy);
+  ctx.restore();
+  }
+  floatTexts = floatTexts.filter(t => t.life > 0);
+  if(boosting){ctx.beginPath();ctx.arc(canvas.width/2,canvas.height/2,PLAYER_RADIUS+14,0,Math.PI*2);ctx.strokeStyle='rgba(255,255,255,0.3)';ctx.lineWidth=2;ctx.stroke();}
+  
+  drawMinimap();
+  requestAnimationFrame(draw);
+  
+}draw();